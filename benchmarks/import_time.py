@@ -0,0 +1,52 @@
+"""Measure how long importing help_desk_client takes in a fresh interpreter.
+
+Run with ``poetry run python benchmarks/import_time.py``. Each import is timed
+in a new process so nothing is already in sys.modules, the best of --repeat runs
+is reported in milliseconds.
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+
+STATEMENTS = {
+    "package": "import help_desk_client",
+    "interfaces": "import help_desk_client.interfaces",
+    "zendesk_class": (
+        "import help_desk_client;"
+        " help_desk_client.get_help_desk_interface("
+        "'help_desk_client.zendesk_manager.ZendeskManager')"
+    ),
+}
+
+
+def time_import(statement):
+    code = (
+        "import time; start = time.perf_counter(); "
+        f"{statement}; print(time.perf_counter() - start)"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    return float(result.stdout) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(
+        json.dumps(
+            {
+                name: min(time_import(statement) for _ in range(args.repeat))
+                for name, statement in STATEMENTS.items()
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
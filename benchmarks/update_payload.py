@@ -0,0 +1,122 @@
+"""Compare full and diff-based update payloads sent by ZendeskManager.
+
+Run with ``poetry run python benchmarks/update_payload.py``. No Zendesk account
+is needed, the Zenpy client is replaced with one that records the JSON body of
+each update. Zendesk's own processing time can't be measured offline, the number
+of fields it has to apply (and so the triggers those fields can fire) is
+reported instead.
+"""
+
+import argparse
+import json
+import time
+
+from help_desk_client.interfaces import HelpDeskCustomField, HelpDeskUser
+from help_desk_client.zendesk_manager import ZendeskManager
+
+
+class RecordingUser:
+    def __init__(self, id):
+        self.id = id
+        self.name = "Bench User"
+        self.email = "bench@example.com"  # /PS-IGNORE
+
+
+class RecordingTicket:
+    def __init__(self, id):
+        self.id = id
+        self.subject = "Benchmark ticket"
+        self.description = "A description " * 50
+        self.status = "open"
+        self.requester_id = 1
+        self.recipient = "support@example.com"  # /PS-IGNORE
+        self.group_id = 10
+        self.priority = "normal"
+        self.tags = [f"tag-{i}" for i in range(20)]
+        self.custom_fields = [{"id": i, "value": f"value-{i}"} for i in range(30)]
+
+
+class RecordingAudit:
+    def __init__(self, ticket):
+        self.ticket = ticket
+
+
+class RecordingClient:
+    """Just enough of the Zenpy client to run ZendeskManager updates."""
+
+    class Users:
+        def __call__(self, id):
+            return RecordingUser(id)
+
+    class Tickets:
+        def __init__(self):
+            self.stored = {}
+            self.payloads = []
+
+        def __call__(self, id):
+            return self.stored.setdefault(id, RecordingTicket(id))
+
+        def update(self, ticket):
+            payload = ticket.to_dict(serialize=True)
+            self.payloads.append(json.dumps({"ticket": payload}))
+            stored = self(ticket.id)
+            for key in ticket._dirty_attributes:
+                setattr(stored, key, getattr(ticket, key))
+            return RecordingAudit(stored)
+
+    def __init__(self):
+        self.users = self.Users()
+        self.tickets = self.Tickets()
+
+
+def run(ticket_state_size, iterations):
+    manager = ZendeskManager(
+        credentials={"email": "bench", "token": "bench", "subdomain": "bench"},
+        ticket_state_size=ticket_state_size,
+    )
+    manager.client = RecordingClient()
+
+    start = time.perf_counter()
+    for i in range(iterations):
+        ticket = manager.get_ticket(i + 1)
+        ticket.user = HelpDeskUser(id=1)
+        ticket.custom_fields = [
+            HelpDeskCustomField(id=field.id, value=field.value)
+            for field in ticket.custom_fields
+        ]
+        ticket.status = "pending"
+        manager.update_ticket(ticket)
+    elapsed = time.perf_counter() - start
+
+    payloads = manager.client.tickets.payloads
+    return {
+        "updates": len(payloads),
+        "mean_payload_bytes": sum(map(len, payloads)) / len(payloads),
+        "mean_fields_sent": sum(len(json.loads(p)["ticket"]) for p in payloads)
+        / len(payloads),
+        "client_ms_per_update": elapsed * 1000 / iterations,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=1000)
+    args = parser.parse_args()
+
+    full = run(0, args.iterations)
+    diff = run(args.iterations, args.iterations)
+    print(
+        json.dumps(
+            {
+                "full": full,
+                "diff": diff,
+                "payload_reduction": 1
+                - diff["mean_payload_bytes"] / full["mean_payload_bytes"],
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
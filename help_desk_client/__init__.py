@@ -1,11 +1,23 @@
+import threading
+from functools import lru_cache
 from importlib import import_module
+from typing import TYPE_CHECKING, Dict, Hashable, Type
 
-from help_desk_client.interfaces import HelpDeskBase
 
+if TYPE_CHECKING:
+    from help_desk_client.interfaces import HelpDeskBase
 
-def get_help_desk_interface(class_path) -> HelpDeskBase:
+
+_managers: Dict[Hashable, "HelpDeskBase"] = {}
+_managers_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def get_help_desk_interface(class_path) -> Type["HelpDeskBase"]:
     """Give access to an instantiated help desk class
 
+    The backend module is only imported the first time its class path is asked for.
+
     :param class_path: The Python import path to the help desk class
     """
     parts = class_path.split(".")
@@ -16,3 +28,64 @@ def get_help_desk_interface(class_path) -> HelpDeskBase:
     cls = getattr(module, cls_string)
 
     return cls
+
+
+def get_help_desk_manager(class_path, **kwargs) -> "HelpDeskBase":
+    """Give access to a shared instance of a help desk class
+
+    Instances are shared between callers, and threads, that pass the same class
+    path and arguments, so they also share the backend client and its connections.
+    Arguments holding callables, e.g. a fallback or conflict_resolver, get a new
+    instance each time, a lambda is new on every call so would never be shared.
+
+    :param class_path: The Python import path to the help desk class
+    :param kwargs: Arguments for the help desk class, e.g. credentials
+    """
+    if _holds_callable(kwargs):
+        return get_help_desk_interface(class_path)(**kwargs)
+
+    key = (class_path, _freeze(kwargs))
+
+    manager = _managers.get(key)
+    if manager is None:
+        with _managers_lock:
+            manager = _managers.get(key)
+            if manager is None:
+                manager = get_help_desk_interface(class_path)(**kwargs)
+                _managers[key] = manager
+    return manager
+
+
+def clear_help_desk_managers() -> None:
+    """Forget the shared instances, e.g. after credentials are rotated"""
+    with _managers_lock:
+        _managers.clear()
+
+
+def _freeze(value) -> Hashable:
+    """Turn arguments into something that can key the shared instances"""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, set):
+        return frozenset(_freeze(v) for v in value)
+    return value
+
+
+def _holds_callable(value) -> bool:
+    """Whether arguments hold a callable anywhere inside them"""
+    if isinstance(value, dict):
+        return any(_holds_callable(v) for v in value.values())
+    if isinstance(value, (list, tuple, set)):
+        return any(_holds_callable(v) for v in value)
+    return callable(value)
+
+
+def __getattr__(name):
+    # HelpDeskBase is imported on first use so importing the package stays cheap.
+    if name == "HelpDeskBase":
+        from help_desk_client.interfaces import HelpDeskBase
+
+        return HelpDeskBase
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
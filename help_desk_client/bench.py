@@ -0,0 +1,324 @@
+import bisect
+import dataclasses
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from help_desk_client import get_help_desk_interface
+from help_desk_client.interfaces import (
+    HelpDeskBase,
+    HelpDeskComment,
+    HelpDeskException,
+    HelpDeskTicket,
+    HelpDeskUser,
+)
+
+
+OPERATIONS = ("create", "get", "comment", "close")
+DEFAULT_MIX = {"create": 1, "get": 5, "comment": 2, "close": 1}
+# Upper bounds, in milliseconds, of the latency histogram buckets.
+HISTOGRAM_BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+BENCH_EMAIL = "bench@example.com"  # /PS-IGNORE
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    """Parse operation weights such as "create=1,get=5,comment=2,close=1".
+
+    :raises:
+        HelpDeskException: If an operation is unknown or no weight is positive.
+    """
+    weights: Dict[str, float] = {}
+    for part in mix.split(","):
+        name, _, weight = part.strip().partition("=")
+        if name not in OPERATIONS:
+            raise HelpDeskException(
+                f"Unknown operation {name!r}, use {', '.join(OPERATIONS)}"
+            )
+        try:
+            weights[name] = float(weight or 1)
+        except ValueError:
+            raise HelpDeskException(f"Weight for {name} is not a number: {weight!r}")
+    if not any(weight > 0 for weight in weights.values()):
+        raise HelpDeskException("At least one operation needs a positive weight")
+    return weights
+
+
+class ApiCallCounter:
+    """HTTP requests sent, in total and by the thread that sent them."""
+
+    def __init__(self):
+        self.total = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def add(self) -> None:
+        with self._lock:
+            self.total += 1
+        self._local.count = self.thread_count() + 1
+
+    def thread_count(self) -> int:
+        """How many requests the calling thread has sent."""
+        return getattr(self._local, "count", 0)
+
+
+@contextmanager
+def count_api_calls() -> Iterator[ApiCallCounter]:
+    """Count the HTTP requests sent through requests, from any thread.
+
+    Zenpy sends everything through requests, so this counts a backend's API
+    calls without it needing to know it is being measured.
+    """
+    counter = ApiCallCounter()
+    try:
+        import requests
+    except ImportError:
+        yield counter
+        return
+
+    send = requests.Session.send
+
+    def counting_send(session, request, **kwargs):
+        counter.add()
+        return send(session, request, **kwargs)
+
+    requests.Session.send = counting_send
+    try:
+        yield counter
+    finally:
+        requests.Session.send = send
+
+
+class OperationStats:
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.errors = 0
+        self.api_calls = 0
+        self.error_types: Dict[str, int] = {}
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        count = len(self.latencies) + self.errors
+        latencies = sorted(self.latencies)
+        histogram = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+        for latency in latencies:
+            histogram[bisect.bisect_left(HISTOGRAM_BOUNDS_MS, latency * 1000)] += 1
+
+        return {
+            "count": count,
+            "errors": self.errors,
+            "error_types": self.error_types,
+            "throughput": count / elapsed if elapsed else 0.0,
+            "api_calls": self.api_calls,
+            "api_calls_per_operation": self.api_calls / count if count else 0.0,
+            "latency_ms": {
+                "min": _ms(latencies[0]) if latencies else None,
+                "mean": _ms(sum(latencies) / len(latencies)) if latencies else None,
+                "p50": _ms(_percentile(latencies, 50)),
+                "p90": _ms(_percentile(latencies, 90)),
+                "p99": _ms(_percentile(latencies, 99)),
+                "max": _ms(latencies[-1]) if latencies else None,
+            },
+            "histogram_ms": [
+                {"le": bound, "count": histogram[i]}
+                for i, bound in enumerate(HISTOGRAM_BOUNDS_MS + (None,))
+            ],
+        }
+
+
+class Workload:
+    """A mix of operations run against one help desk from many threads.
+
+    Operations on a ticket pick one created during the run, until one has
+    been created everything is a create. Closed tickets aren't commented on
+    or closed again.
+
+    API calls are put down to an operation when they are sent from the
+    thread running it. Calls a backend sends from threads of its own, e.g.
+    hedged reads, parallel uploads and job status polls, are only counted
+    in the report's api_calls and unattributed_api_calls.
+    """
+
+    def __init__(
+        self,
+        help_desk: HelpDeskBase,
+        mix: Dict[str, float],
+        user: HelpDeskUser,
+        seed: Optional[int] = None,
+    ):
+        self.help_desk = help_desk
+        self.operations = [name for name in OPERATIONS if mix.get(name, 0) > 0]
+        self.weights = [mix[name] for name in self.operations]
+        self.user = user
+        self.seed = seed
+        self.stats = {name: OperationStats() for name in OPERATIONS}
+        self._lock = threading.Lock()
+        self._ticket_ids: List[int] = []
+        self._open_ticket_ids: List[int] = []
+        self._remaining: Optional[int] = None
+        self._api_calls = ApiCallCounter()
+
+    def run(
+        self,
+        concurrency: int,
+        duration: float,
+        max_operations: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """Run the workload and report on it.
+
+        :param concurrency: How many threads send operations at once.
+        :param duration: Seconds to keep sending operations for.
+        :param max_operations: Stop after this many operations in total.
+
+        :returns: The report, see report().
+        """
+        self._remaining = max_operations
+        deadline = time.monotonic() + duration
+        threads = [
+            threading.Thread(target=self.__worker, args=(worker, deadline))
+            for worker in range(concurrency)
+        ]
+        started = time.perf_counter()
+        with count_api_calls() as api_calls:
+            self._api_calls = api_calls
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        return self.report(time.perf_counter() - started, concurrency)
+
+    def report(self, elapsed: float, concurrency: int) -> Dict[str, Any]:
+        operations = {
+            name: self.stats[name].report(elapsed)
+            for name in OPERATIONS
+            if self.stats[name].latencies or self.stats[name].errors
+        }
+        count = sum(operation["count"] for operation in operations.values())
+        attributed = sum(operation["api_calls"] for operation in operations.values())
+        return {
+            "concurrency": concurrency,
+            "duration": elapsed,
+            "operations": count,
+            "errors": sum(operation["errors"] for operation in operations.values()),
+            "throughput": count / elapsed if elapsed else 0.0,
+            "api_calls": self._api_calls.total,
+            "unattributed_api_calls": self._api_calls.total - attributed,
+            "by_operation": operations,
+        }
+
+    def __worker(self, worker: int, deadline: float) -> None:
+        rand = random.Random(None if self.seed is None else self.seed + worker)
+        while time.monotonic() < deadline and self.__take_turn():
+            self.__run_operation(
+                rand.choices(self.operations, weights=self.weights)[0], rand
+            )
+
+    def __take_turn(self) -> bool:
+        with self._lock:
+            if self._remaining is None:
+                return True
+            if self._remaining <= 0:
+                return False
+            self._remaining -= 1
+            return True
+
+    def __run_operation(self, name: str, rand: random.Random) -> None:
+        ticket_id = None
+        if name != "create":
+            with self._lock:
+                ticket_ids = (
+                    self._ticket_ids if name == "get" else self._open_ticket_ids
+                )
+                if ticket_ids:
+                    ticket_id = rand.choice(ticket_ids)
+                    if name == "close":
+                        self._open_ticket_ids.remove(ticket_id)
+            if ticket_id is None:
+                name = "create"
+
+        stats = self.stats[name]
+        api_calls = self._api_calls.thread_count()
+        started = time.perf_counter()
+        try:
+            if name == "create":
+                ticket = self.help_desk.create_ticket(
+                    HelpDeskTicket(
+                        subject="Benchmark ticket",
+                        description="Created by help-desk-client bench",
+                        user=dataclasses.replace(self.user),
+                    )
+                )
+                with self._lock:
+                    self._ticket_ids.append(ticket.id)
+                    self._open_ticket_ids.append(ticket.id)
+            elif name == "get":
+                self.help_desk.get_ticket(ticket_id)
+            elif name == "comment":
+                self.help_desk.add_comment(
+                    ticket_id,
+                    HelpDeskComment(body="Benchmark comment", author_id=self.user.id),
+                )
+            elif name == "close":
+                self.help_desk.close_ticket(ticket_id)
+        except Exception as e:
+            latency = None
+            error_type = type(e).__name__
+        else:
+            latency = time.perf_counter() - started
+
+        with self._lock:
+            stats.api_calls += self._api_calls.thread_count() - api_calls
+            if latency is None:
+                stats.errors += 1
+                stats.error_types[error_type] = stats.error_types.get(error_type, 0) + 1
+            else:
+                stats.latencies.append(latency)
+
+
+def run_bench(
+    class_path: str,
+    options: Optional[Dict[str, Any]] = None,
+    mix: Optional[Dict[str, float]] = None,
+    concurrency: int = 4,
+    duration: float = 10,
+    max_operations: Optional[int] = None,
+    user: Optional[HelpDeskUser] = None,
+    seed: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Run a mixed workload against a help desk class and report on it.
+
+    :param class_path: The Python import path to the help desk class, as taken by
+        get_help_desk_interface.
+    :param options: Arguments for the help desk class, e.g. credentials.
+    :param mix: Relative weights of the create, get, comment and close operations.
+    :param concurrency: How many threads send operations at once.
+    :param duration: Seconds to keep sending operations for.
+    :param max_operations: Stop after this many operations in total.
+    :param user: The requester of created tickets.
+    :param seed: Seed for choosing operations, for repeatable runs.
+
+    :returns: The report: throughput, latency percentiles and histograms, errors
+        and API calls, in total and by operation.
+    """
+    help_desk = get_help_desk_interface(class_path)(**(options or {}))
+    workload = Workload(
+        help_desk,
+        mix or DEFAULT_MIX,
+        user or HelpDeskUser(full_name="Benchmark", email=BENCH_EMAIL),
+        seed,
+    )
+    return {
+        "class_path": class_path,
+        **workload.run(concurrency, duration, max_operations),
+    }
+
+
+def _percentile(latencies: List[float], percent: float) -> Optional[float]:
+    if not latencies:
+        return None
+    return latencies[min(len(latencies) - 1, int(len(latencies) * percent / 100))]
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return round(seconds * 1000, 3) if seconds is not None else None
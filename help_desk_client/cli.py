@@ -0,0 +1,90 @@
+import argparse
+import json
+import sys
+from typing import List, Optional
+
+from help_desk_client.interfaces import HelpDeskException, HelpDeskUser
+
+
+STUBBED = "help_desk_client.interfaces.HelpDeskStubbed"
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Entry point of the help-desk-client command."""
+    parser = argparse.ArgumentParser(prog="help-desk-client")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    bench = commands.add_parser(
+        "bench",
+        help="Run a mixed workload against a help desk and report on it as JSON",
+    )
+    bench.add_argument(
+        "--class-path",
+        default=STUBBED,
+        help=f"Python import path to the help desk class (default {STUBBED})",
+    )
+    bench.add_argument(
+        "--options",
+        default="{}",
+        help="JSON arguments for the help desk class, e.g. '{\"credentials\": {...}}'",
+    )
+    bench.add_argument(
+        "--options-file", help="File of JSON arguments for the help desk class"
+    )
+    bench.add_argument(
+        "--mix",
+        default="create=1,get=5,comment=2,close=1",
+        help="Relative weights of the operations (default %(default)s)",
+    )
+    bench.add_argument("--concurrency", type=int, default=4)
+    bench.add_argument("--duration", type=float, default=10, help="Seconds to run for")
+    bench.add_argument(
+        "--max-operations", type=int, help="Stop after this many operations"
+    )
+    bench.add_argument("--user-id", type=int, help="Requester of created tickets")
+    bench.add_argument("--user-email", help="Requester of created tickets")
+    bench.add_argument("--seed", type=int, help="Seed for repeatable operation order")
+    bench.add_argument("--output", help="Write the report here instead of stdout")
+
+    args = parser.parse_args(argv)
+    try:
+        return _bench(args)
+    except (HelpDeskException, ValueError) as e:
+        parser.exit(2, f"help-desk-client: error: {e}\n")
+
+
+def _bench(args: argparse.Namespace) -> int:
+    from help_desk_client.bench import BENCH_EMAIL, parse_mix, run_bench
+
+    if args.options_file:
+        with open(args.options_file) as f:
+            options = json.load(f)
+    else:
+        options = json.loads(args.options)
+
+    user = None
+    if args.user_id or args.user_email:
+        user = HelpDeskUser(id=args.user_id, email=args.user_email or BENCH_EMAIL)
+
+    report = run_bench(
+        args.class_path,
+        options=options,
+        mix=parse_mix(args.mix),
+        concurrency=args.concurrency,
+        duration=args.duration,
+        max_operations=args.max_operations,
+        user=user,
+        seed=args.seed,
+    )
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
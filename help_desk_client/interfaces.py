@@ -1,8 +1,9 @@
 import datetime
+import threading
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
-from typing import Dict, List, Optional
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 
 class Priority(Enum):
@@ -33,17 +34,59 @@ class HelpDeskUser:
     email: Optional[str] = None
 
 
+@dataclass
+class HelpDeskAttachment:
+    file_name: str
+    id: Optional[int] = None
+    content_url: Optional[str] = None
+    content_type: Optional[str] = None
+    size: Optional[int] = None
+    # What to upload: a path, bytes, or a binary file object such as an open
+    # file or an mmap. File objects are read as they are sent, not up front.
+    content: Any = field(default=None, repr=False, compare=False)
+
+
 @dataclass
 class HelpDeskComment:
     body: str
     public: bool = True
     author_id: Optional[int] = None
+    id: Optional[int] = None
+    created_at: Optional[datetime.datetime] = None
+    attachments: Optional[List[HelpDeskAttachment]] = None
+    upload_token: Optional[str] = None
 
 
 @dataclass
 class HelpDeskCustomField:
     id: int
+    # A string as given, or the checked value the field type takes, e.g. a bool
+    # for checkboxes or a list of option values for multi-selects.
+    value: Any
+
+
+@dataclass
+class HelpDeskFieldOption:
+    name: str
     value: str
+    id: Optional[int] = None
+
+
+@dataclass
+class HelpDeskTicketField:
+    id: int
+    title: str
+    type: str
+    required: bool = False
+    active: bool = True
+    options: Optional[List[HelpDeskFieldOption]] = None
+    regexp_for_validation: Optional[str] = None
+
+
+@dataclass
+class HelpDeskGroup:
+    id: int
+    name: str
 
 
 @dataclass
@@ -68,6 +111,23 @@ class HelpDeskTicket:
     ticket_type: Optional[TicketType] = None
 
 
+@dataclass
+class HelpDeskTicketDelta:
+    ticket_id: int
+    # New values keyed by HelpDeskTicket field name.
+    changes: Dict[str, Any] = field(default_factory=dict)
+    deleted: bool = False
+    updated_at: Optional[datetime.datetime] = None
+
+
+@dataclass
+class HelpDeskUserDelta:
+    user_id: int
+    # New values keyed by HelpDeskUser field name.
+    changes: Dict[str, Any] = field(default_factory=dict)
+    deleted: bool = False
+
+
 class HelpDeskException(Exception):
     pass
 
@@ -76,11 +136,30 @@ class HelpDeskTicketNotFoundException(Exception):
     pass
 
 
+class HelpDeskTicketConflictException(Exception):
+    pass
+
+
+class HelpDeskUnavailableException(Exception):
+    pass
+
+
+class HelpDeskValidationException(Exception):
+    pass
+
+
 class HelpDeskBase(ABC):
     @abstractmethod
     def get_or_create_user(self, user: HelpDeskUser) -> HelpDeskUser:
         raise NotImplementedError
 
+    def get_or_create_users(self, users: Iterable[HelpDeskUser]) -> List[HelpDeskUser]:
+        """Get or create many users, in the same order as given.
+
+        Backends with a batch API should override this.
+        """
+        return [self.get_or_create_user(user) for user in users]
+
     @abstractmethod
     def create_ticket(self, ticket: HelpDeskTicket) -> HelpDeskTicket:
         raise NotImplementedError
@@ -101,6 +180,49 @@ class HelpDeskBase(ABC):
     def update_ticket(self, ticket: HelpDeskTicket) -> HelpDeskTicket:
         raise NotImplementedError
 
+    def iter_comments(
+        self, ticket_id: int, include_authors: bool = False
+    ) -> Iterator[HelpDeskComment]:
+        """Lazily yield the comments on a ticket, oldest first."""
+        raise NotImplementedError
+
+    def upload_attachment(
+        self, attachment: HelpDeskAttachment, token: Optional[str] = None
+    ) -> str:
+        """Upload an attachment, returning the upload token to put on a comment.
+
+        Passing the token from an earlier upload adds the file to that upload.
+        """
+        raise NotImplementedError
+
+    def upload_attachments(
+        self, attachments: Iterable[HelpDeskAttachment], token: Optional[str] = None
+    ) -> Optional[str]:
+        """Upload many attachments under one upload token.
+
+        Backends that can upload in parallel should override this.
+        """
+        for attachment in attachments:
+            token = self.upload_attachment(attachment, token)
+        return token
+
+    def apply_delta(self, delta: Union[HelpDeskTicketDelta, HelpDeskUserDelta]) -> None:
+        """Apply a change pushed by the help desk to any locally held state.
+
+        Backends that hold no state have nothing to do.
+        """
+
+    def iter_comments_for_tickets(
+        self, ticket_ids: Iterable[int], include_authors: bool = False
+    ) -> Iterator[Tuple[int, HelpDeskComment]]:
+        """Lazily yield (ticket_id, comment) for the comments on many tickets.
+
+        Backends that can share work between tickets should override this.
+        """
+        for ticket_id in ticket_ids:
+            for comment in self.iter_comments(ticket_id, include_authors):
+                yield ticket_id, comment
+
 
 class HelpDeskStubbed(HelpDeskBase):
     def __init__(self, *args, **kwargs) -> None:
@@ -108,26 +230,33 @@ class HelpDeskStubbed(HelpDeskBase):
         self._tickets: Dict[int, HelpDeskTicket] = {}
         self._users: Dict[int, HelpDeskUser] = {}
         self._next_user_id = 1
+        self._comments: Dict[int, List[HelpDeskComment]] = {}
+        self._next_attachment_id = 1
+        # Guards the id counters, e.g. for the bench command's threads.
+        self._lock = threading.Lock()
 
     def get_or_create_user(self, user: HelpDeskUser) -> HelpDeskUser:
 
         if user.id:
             user_id = user.id
         else:
-            user_id = self._next_user_id
-            self._next_user_id += 1
+            with self._lock:
+                user_id = self._next_user_id
+                self._next_user_id += 1
 
-        if not self._users[user_id]:
+        if not self._users.get(user_id):
+            user.id = user_id
             self._users[user_id] = user
 
         return self._users[user_id]
 
     def create_ticket(self, ticket: HelpDeskTicket) -> HelpDeskTicket:
         ticket.created_at = datetime.datetime.now()
-        self._tickets[self._next_ticket_id] = ticket
-        ticket.id = self._next_ticket_id
+        with self._lock:
+            self._tickets[self._next_ticket_id] = ticket
+            ticket.id = self._next_ticket_id
 
-        self._next_ticket_id += 1
+            self._next_ticket_id += 1
 
         return ticket
 
@@ -139,6 +268,8 @@ class HelpDeskStubbed(HelpDeskBase):
 
     def add_comment(self, ticket_id: int, comment: HelpDeskComment) -> HelpDeskTicket:
         if self._tickets.get(ticket_id):
+            comment.created_at = datetime.datetime.now()
+            self._comments.setdefault(ticket_id, []).append(comment)
             self._tickets[ticket_id].comment = comment
             self._tickets[ticket_id].updated_at = datetime.datetime.now()
             return self._tickets[ticket_id]
@@ -162,3 +293,32 @@ class HelpDeskStubbed(HelpDeskBase):
             return self._tickets[ticket.id]
         else:
             raise HelpDeskTicketNotFoundException
+
+    def iter_comments(
+        self, ticket_id: int, include_authors: bool = False
+    ) -> Iterator[HelpDeskComment]:
+        if self._tickets.get(ticket_id):
+            return iter(list(self._comments.get(ticket_id, [])))
+        else:
+            raise HelpDeskTicketNotFoundException
+
+    def upload_attachment(
+        self, attachment: HelpDeskAttachment, token: Optional[str] = None
+    ) -> str:
+        with self._lock:
+            attachment.id = self._next_attachment_id
+            self._next_attachment_id += 1
+
+        return token or f"token{attachment.id}"
+
+    def apply_delta(self, delta: Union[HelpDeskTicketDelta, HelpDeskUserDelta]) -> None:
+        if isinstance(delta, HelpDeskTicketDelta):
+            records, record_id = self._tickets, delta.ticket_id
+        else:
+            records, record_id = self._users, delta.user_id
+
+        if delta.deleted:
+            records.pop(record_id, None)
+        elif records.get(record_id):
+            for name, value in delta.changes.items():
+                setattr(records[record_id], name, value)
@@ -0,0 +1,137 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Executor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures import wait
+from typing import Callable, Deque, Dict, Optional, TypeVar
+
+import requests
+
+
+T = TypeVar("T")
+
+
+class LatencyTracker:
+    """Rolling window of observed latencies per operation."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        """Create a new tracker.
+
+        :param window: How many of the latest latencies are kept per operation.
+        :param min_samples: How many latencies are needed before percentiles are given.
+        """
+        self.window = window
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._latencies: Dict[str, Deque[float]] = {}
+
+    def record(self, operation: str, seconds: float) -> None:
+        with self._lock:
+            self._latencies.setdefault(operation, deque(maxlen=self.window)).append(
+                seconds
+            )
+
+    def percentile(self, operation: str, percent: float) -> Optional[float]:
+        """The latency, in seconds, below which percent of the calls completed.
+
+        :returns: None until min_samples latencies have been recorded.
+        """
+        with self._lock:
+            latencies = sorted(self._latencies.get(operation, ()))
+        if not latencies or len(latencies) < self.min_samples:
+            return None
+        index = min(len(latencies) - 1, int(len(latencies) * percent / 100))
+        return latencies[index]
+
+
+class CircuitBreaker:
+    """Fail fast once a backend keeps failing, and probe it again after a while.
+
+    After failure_threshold consecutive failures the circuit opens and calls are
+    refused. Once reset_timeout seconds have passed a single trial call is let
+    through, its success closes the circuit and its failure opens it again. A
+    trial that ends some other way is released so the next call can try again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead now."""
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN:
+                if self._trial_running:
+                    return False
+                self._trial_running = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self._failures = 0
+            self._trial_running = False
+
+    def release_trial(self) -> None:
+        """Let another trial through after one that proved nothing either way."""
+        with self._lock:
+            self._trial_running = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+            self._trial_running = False
+
+
+def is_backend_failure(error: Exception) -> bool:
+    """Whether an error means the backend is unhealthy, rather than the request bad.
+
+    Connection errors, timeouts, server errors and rate limiting count, errors
+    such as a missing record do not.
+    """
+    if isinstance(error, requests.exceptions.RequestException):
+        return True
+    status_code = getattr(getattr(error, "response", None), "status_code", None)
+    return status_code is not None and (status_code >= 500 or status_code == 429)
+
+
+def hedged_call(func: Callable[[], T], delay: float, executor: Executor) -> T:
+    """Call func, and call it again if the first call hasn't finished after delay.
+
+    The first of the two to succeed wins. Only use this for idempotent calls.
+
+    :param func: The call to make.
+    :param delay: Seconds to wait before sending the duplicate.
+    :param executor: Executor to run the calls on.
+
+    :returns: The result of whichever call succeeded first.
+    """
+    first = executor.submit(func)
+    try:
+        return first.result(timeout=delay)
+    except FutureTimeoutError:
+        pass
+
+    second = executor.submit(func)
+    done, _ = wait([first, second], return_when=FIRST_COMPLETED)
+    winner = done.pop()
+    if winner.exception() is None:
+        return winner.result()
+    return (second if winner is first else first).result()
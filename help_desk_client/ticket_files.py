@@ -0,0 +1,316 @@
+import datetime
+import json
+import mmap
+import os
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional, Union
+
+from help_desk_client.interfaces import HelpDeskException, HelpDeskTicket
+from help_desk_client.ticket_records import (
+    parse_datetime,
+    ticket_from_record,
+    ticket_to_record,
+)
+
+
+NDJSON = "ndjson"
+PARQUET = "parquet"
+
+CUSTOM_FIELD_PREFIX = "custom_field_"
+DATETIME_COLUMNS = ("created_at", "updated_at", "due_at")
+# HelpDeskTicket fields written to a column of the same name.
+TICKET_COLUMNS = (
+    "id",
+    "subject",
+    "description",
+    "group_id",
+    "external_id",  # /PS-IGNORE
+    "assingee_id",
+    "recipient_email",
+    "responder",
+    "status",
+    "priority",
+    "ticket_type",
+) + DATETIME_COLUMNS
+USER_COLUMNS = {"user_id": "id", "user_full_name": "full_name", "user_email": "email"}
+
+
+def ticket_to_line(ticket: HelpDeskTicket) -> bytes:
+    """A HelpDeskTicket as a line of NDJSON."""
+    return json.dumps(ticket_to_record(ticket), sort_keys=True).encode() + b"\n"
+
+
+class NDJSONTicketWriter:
+    """Write tickets to a file as they arrive, one JSON object per line.
+
+    Usable as a context manager, a path is opened and closed here and a
+    binary file object is left open.
+    """
+
+    def __init__(self, file: Union[str, IO[bytes]]):
+        self._owns_file = isinstance(file, str)
+        self.file = open(file, "wb") if self._owns_file else file
+        self.count = 0
+
+    def write(self, ticket: HelpDeskTicket) -> None:
+        self.file.write(ticket_to_line(ticket))
+        self.count += 1
+
+    def write_all(self, tickets: Iterable[HelpDeskTicket]) -> int:
+        """Write every ticket from an iterable, one at a time.
+
+        :returns: How many tickets were written.
+        """
+        for ticket in tickets:
+            self.write(ticket)
+        return self.count
+
+    def close(self) -> None:
+        if self._owns_file:
+            self.file.close()
+        else:
+            self.file.flush()
+
+    def __enter__(self) -> "NDJSONTicketWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class ParquetTicketWriter:
+    """Write tickets to a Parquet file as they arrive, batch_size rows at a time.
+
+    Nested values are flattened into columns: the user into user_id,
+    user_full_name and user_email, each custom field into custom_field_<id>,
+    tags into a list column and the comment into a JSON column. Enums are
+    written as their values and datetimes as UTC timestamps. Custom field
+    values are written as text, values that aren't strings, such as checkboxes
+    and multi-selects, as JSON.
+
+    Needs pyarrow, installed with the parquet extra, e.g.
+    pip install help-desk-client[parquet].
+    """
+
+    def __init__(
+        self,
+        path: str,
+        custom_field_ids: Optional[Iterable[int]] = None,
+        batch_size: int = 1000,
+    ):
+        """Create a new writer.
+
+        :param path: Where to write the file.
+        :param custom_field_ids: Custom fields to give columns (default those on
+            the first batch of tickets).
+        :param batch_size: How many tickets are held before being written.
+        """
+        self.pa, self.pq = _pyarrow()
+        self.path = path
+        self.custom_field_ids = (
+            sorted(custom_field_ids) if custom_field_ids is not None else None
+        )
+        self.batch_size = batch_size
+        self.count = 0
+        self._rows: List[Dict[str, Any]] = []
+        self._writer = None
+
+    def write(self, ticket: HelpDeskTicket) -> None:
+        self._rows.append(self.__row(ticket))
+        self.count += 1
+        if len(self._rows) >= self.batch_size:
+            self.__write_rows()
+
+    def write_all(self, tickets: Iterable[HelpDeskTicket]) -> int:
+        """Write every ticket from an iterable, one at a time.
+
+        :returns: How many tickets were written.
+        """
+        for ticket in tickets:
+            self.write(ticket)
+        return self.count
+
+    def close(self) -> None:
+        self.__write_rows()
+        if self._writer is None:
+            self._writer = self.pq.ParquetWriter(self.path, self.__schema())
+        self._writer.close()
+
+    def __enter__(self) -> "ParquetTicketWriter":
+        return self
+
+    def __exit__(self, exc_type, *exc_info) -> None:
+        if exc_type is None:
+            self.close()
+        elif self._writer is not None:
+            self._writer.close()
+
+    def __write_rows(self) -> None:
+        if not self._rows:
+            return
+        if self.custom_field_ids is None:
+            self.custom_field_ids = sorted(
+                {
+                    int(key[len(CUSTOM_FIELD_PREFIX) :])
+                    for row in self._rows
+                    for key in row
+                    if key.startswith(CUSTOM_FIELD_PREFIX)
+                }
+            )
+        schema = self.__schema()
+        columns = set(schema.names)
+        for row in self._rows:
+            for key in row:
+                if key not in columns:
+                    raise HelpDeskException(
+                        f"Ticket {row['id']} has {key} which has no column, "
+                        "pass it in custom_field_ids"
+                    )
+        if self._writer is None:
+            self._writer = self.pq.ParquetWriter(self.path, schema)
+        self._writer.write_table(self.pa.Table.from_pylist(self._rows, schema=schema))
+        self._rows = []
+
+    def __schema(self):
+        pa = self.pa
+        timestamp = pa.timestamp("us", tz="UTC")
+        types = {
+            "id": pa.int64(),
+            "group_id": pa.int64(),
+            "assingee_id": pa.int64(),
+        }
+        columns = [
+            (
+                name,
+                timestamp if name in DATETIME_COLUMNS else types.get(name, pa.string()),
+            )
+            for name in TICKET_COLUMNS
+        ]
+        columns += [
+            ("user_id", pa.int64()),
+            ("user_full_name", pa.string()),
+            ("user_email", pa.string()),
+            ("tags", pa.list_(pa.string())),
+            ("comment", pa.string()),
+        ]
+        columns += [
+            (f"{CUSTOM_FIELD_PREFIX}{field_id}", pa.string())
+            for field_id in self.custom_field_ids or []
+        ]
+        return pa.schema(columns)
+
+    def __row(self, ticket: HelpDeskTicket) -> Dict[str, Any]:
+        record = ticket_to_record(ticket)
+        row = {name: record[name] for name in TICKET_COLUMNS}
+        for name in DATETIME_COLUMNS:
+            row[name] = _utc_datetime(record[name])
+        if row["external_id"] is not None:
+            row["external_id"] = str(row["external_id"])
+        for column, key in USER_COLUMNS.items():
+            row[column] = (record["user"] or {}).get(key)
+        row["tags"] = record["tags"]
+        row["comment"] = json.dumps(record["comment"]) if record["comment"] else None
+        for custom_field in record["custom_fields"] or []:
+            value = custom_field["value"]
+            if value is not None and not isinstance(value, str):
+                value = json.dumps(value)
+            row[f"{CUSTOM_FIELD_PREFIX}{custom_field['id']}"] = value
+        return row
+
+
+def write_tickets(
+    tickets: Iterable[HelpDeskTicket], path: str, format: Optional[str] = None, **kwargs
+) -> int:
+    """Stream tickets to a file, holding at most one batch of them at a time.
+
+    :param tickets: Any iterable of HelpDeskTicket instances, e.g. a generator.
+    :param path: Where to write the file.
+    :param format: "ndjson" or "parquet" (default from the path's extension).
+    :param kwargs: Arguments for ParquetTicketWriter.
+
+    :returns: How many tickets were written.
+    """
+    if _format(path, format) == PARQUET:
+        writer = ParquetTicketWriter(path, **kwargs)
+    else:
+        writer = NDJSONTicketWriter(path)
+    with writer:
+        return writer.write_all(tickets)
+
+
+def read_tickets(
+    path: str, format: Optional[str] = None, batch_size: int = 1000
+) -> Iterator[HelpDeskTicket]:
+    """Lazily read tickets back from a file written by write_tickets.
+
+    The file is memory mapped, so only the pages being read are held.
+
+    :param path: The file to read.
+    :param format: "ndjson" or "parquet" (default from the path's extension).
+    :param batch_size: How many Parquet rows are read at once.
+
+    :returns: Iterator of HelpDeskTicket instances.
+    """
+    if _format(path, format) == PARQUET:
+        yield from _read_parquet(path, batch_size)
+        return
+
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as lines:
+            for line in iter(lines.readline, b""):
+                if line.strip():
+                    yield ticket_from_record(json.loads(line))
+
+
+def _read_parquet(path: str, batch_size: int) -> Iterator[HelpDeskTicket]:
+    _, pq = _pyarrow()
+    parquet_file = pq.ParquetFile(path, memory_map=True)
+    custom_field_columns = [
+        name
+        for name in parquet_file.schema_arrow.names
+        if name.startswith(CUSTOM_FIELD_PREFIX)
+    ]
+    for batch in parquet_file.iter_batches(batch_size=batch_size):
+        for row in batch.to_pylist():
+            record = {name: row[name] for name in TICKET_COLUMNS}
+            user = {key: row[column] for column, key in USER_COLUMNS.items()}
+            record["user"] = user if any(v is not None for v in user.values()) else None
+            record["tags"] = row["tags"]
+            record["comment"] = json.loads(row["comment"]) if row["comment"] else None
+            record["custom_fields"] = [
+                {"id": int(name[len(CUSTOM_FIELD_PREFIX) :]), "value": row[name]}
+                for name in custom_field_columns
+                if row[name] is not None
+            ] or None
+            yield ticket_from_record(record)
+
+
+def _format(path: str, format: Optional[str]) -> str:
+    if format is None:
+        return PARQUET if path.endswith(".parquet") else NDJSON
+    if format not in (NDJSON, PARQUET):
+        raise HelpDeskException(f"Unknown ticket file format {format}")
+    return format
+
+
+def _utc_datetime(value: Any) -> Optional[datetime.datetime]:
+    value = parse_datetime(value)
+    if value is None:
+        return None
+    if not isinstance(value, datetime.datetime):
+        raise HelpDeskException(f"{value!r} is not a datetime")
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return value.astimezone(datetime.timezone.utc)
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError(
+            "Parquet ticket files need pyarrow, install help-desk-client[parquet]"
+        ) from e
+    return pyarrow, pyarrow.parquet
@@ -0,0 +1,95 @@
+import dataclasses
+import datetime
+from enum import Enum
+from typing import Any, Dict, Optional, Type
+
+from help_desk_client.interfaces import (
+    HelpDeskAttachment,
+    HelpDeskComment,
+    HelpDeskCustomField,
+    HelpDeskTicket,
+    HelpDeskUser,
+    Priority,
+    Status,
+    TicketType,
+)
+
+
+DATETIME_FIELDS = {"created_at", "updated_at", "due_at"}
+ENUM_FIELDS: Dict[str, Type[Enum]] = {
+    "status": Status,
+    "priority": Priority,
+    "ticket_type": TicketType,
+}
+
+
+def ticket_to_record(ticket: HelpDeskTicket) -> Dict[str, Any]:
+    """A HelpDeskTicket as a dict that can be written as JSON.
+
+    Enums are written as their values and datetimes as ISO 8601 strings.
+    Attachment content is left out.
+    """
+    record = dataclasses.asdict(ticket)
+    if record["comment"]:
+        for attachment in record["comment"]["attachments"] or []:
+            attachment.pop("content", None)
+    return _encode(record)
+
+
+def ticket_from_record(record: Dict[str, Any]) -> HelpDeskTicket:
+    """The HelpDeskTicket written by ticket_to_record.
+
+    Values that aren't one of an enum's values, e.g. a status Zendesk added
+    later, are kept as strings.
+    """
+    values = dict(record)
+    for name in DATETIME_FIELDS:
+        values[name] = parse_datetime(values.get(name))
+    for name, enum in ENUM_FIELDS.items():
+        values[name] = _enum_value(enum, values.get(name))
+    if values.get("user"):
+        values["user"] = HelpDeskUser(**values["user"])
+    if values.get("custom_fields"):
+        values["custom_fields"] = [
+            HelpDeskCustomField(**custom_field)
+            for custom_field in values["custom_fields"]
+        ]
+    if values.get("comment"):
+        comment = dict(values["comment"])
+        comment["created_at"] = parse_datetime(comment.get("created_at"))
+        if comment.get("attachments"):
+            comment["attachments"] = [
+                HelpDeskAttachment(**attachment)
+                for attachment in comment["attachments"]
+            ]
+        values["comment"] = HelpDeskComment(**comment)
+    return HelpDeskTicket(**values)
+
+
+def parse_datetime(value: Any) -> Any:
+    """An ISO 8601 string as a datetime, anything else as it is."""
+    if not isinstance(value, str):
+        return value
+    try:
+        return datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return value
+
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return {key: _encode(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_encode(item) for item in value]
+    return value
+
+
+def _enum_value(enum: Type[Enum], value: Any) -> Optional[Any]:
+    try:
+        return enum(value) if value is not None else None
+    except ValueError:
+        return value
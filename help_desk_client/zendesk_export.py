@@ -0,0 +1,419 @@
+import dataclasses
+import datetime
+import heapq
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+import requests
+
+from help_desk_client import get_help_desk_interface
+from help_desk_client.interfaces import HelpDeskException, HelpDeskTicket
+from help_desk_client.ticket_files import ticket_to_line
+from help_desk_client.ticket_records import parse_datetime
+
+
+logger = logging.getLogger(__name__)
+
+ZENDESK_MANAGER = "help_desk_client.zendesk_manager.ZendeskManager"
+PARTITION_BY_TIME = "time"
+PARTITION_BY_ID = "id"
+
+
+@dataclass
+class ExportShard:
+    index: int
+    # Unix times or ticket ids, start inclusive and end exclusive. A time
+    # shard without an end follows the export up to the present.
+    start: int
+    end: Optional[int]
+    partition_by: str = PARTITION_BY_TIME
+
+    @property
+    def name(self) -> str:
+        return f"shard-{self.index:04d}"
+
+
+class RateBudget:
+    """Requests per minute shared by every process of an export.
+
+    A token bucket in shared memory, holding at most a second's worth of
+    requests so they are spread over the minute. Pass it to other processes
+    when they are started, e.g. as a pool initializer argument.
+    """
+
+    def __init__(self, requests_per_minute: float):
+        self.requests_per_minute = requests_per_minute
+        self.capacity = max(1.0, requests_per_minute / 60)
+        self._lock = multiprocessing.Lock()
+        self._tokens = multiprocessing.RawValue("d", self.capacity)
+        self._updated_at = multiprocessing.RawValue("d", time.monotonic())
+
+    def acquire(self) -> None:
+        """Wait until a request may be sent."""
+        rate = self.requests_per_minute / 60
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens.value = min(
+                    self.capacity,
+                    self._tokens.value + (now - self._updated_at.value) * rate,
+                )
+                self._updated_at.value = now
+                if self._tokens.value >= 1:
+                    self._tokens.value -= 1
+                    return
+                wait = (1 - self._tokens.value) / rate
+            time.sleep(wait)
+
+
+class RateLimitedSession(requests.Session):
+    """requests Session that waits on a RateBudget before each request."""
+
+    def __init__(self, budget: RateBudget):
+        super().__init__()
+        self.budget = budget
+
+    def request(self, *args, **kwargs):
+        self.budget.acquire()
+        return super().request(*args, **kwargs)
+
+
+class ZendeskExporter:
+    """Export every ticket in a time or id range by shard, across processes.
+
+    Each shard is read by its own manager in a worker process and written to
+    its own NDJSON file of ticket_to_record dicts, with a checkpoint file so an
+    interrupted export picks up where it stopped when run again with the same
+    shards and directory. Finished shards are merged into one file ordered by
+    ticket id, keeping the latest version of a ticket that changed mid export::
+
+        exporter = ZendeskExporter("export", workers=8, requests_per_minute=400,
+                                   credentials=credentials)
+        exporter.export_time_range(datetime.datetime(2018, 1, 1), shards=64)
+
+    Manager arguments are sent to the worker processes, so must be picklable.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        workers: int = 4,
+        requests_per_minute: Optional[float] = None,
+        checkpoint_every: int = 100,
+        class_path: str = ZENDESK_MANAGER,
+        **manager_kwargs,
+    ):
+        """Create a new exporter.
+
+        :param directory: Where shard, checkpoint and merged files are written.
+        :param workers: How many processes export shards at once, 1 or less
+            exports them one after another in this process.
+        :param requests_per_minute: Request budget shared by all the workers
+            (default None, each manager only has Zenpy's own rate limiting).
+        :param checkpoint_every: How many tickets are written between
+            checkpoints of a time shard, id shards checkpoint every batch.
+        :param class_path: The Python import path of the manager class.
+        :param manager_kwargs: Arguments for each worker's manager, e.g.
+            credentials. Ticket state is not kept unless ticket_state_size is given.
+        """
+        self.directory = directory
+        self.workers = workers
+        self.requests_per_minute = requests_per_minute
+        self.checkpoint_every = checkpoint_every
+        self.class_path = class_path
+        self.manager_kwargs = dict(manager_kwargs)
+        self.manager_kwargs.setdefault("ticket_state_size", 0)
+
+    def export_time_range(
+        self,
+        start_time: Union[datetime.datetime, int],
+        end_time: Optional[Union[datetime.datetime, int]] = None,
+        shards: int = 8,
+        output: Optional[str] = None,
+    ) -> str:
+        """Export the tickets last changed in a time range.
+
+        :param start_time: Datetime or Unix time to export from.
+        :param end_time: Datetime or Unix time to export up to. By default the
+            range ends when the export starts, and tickets that change while it
+            runs are exported again once the shards are done.
+        :param shards: How many equal time ranges to split the range into.
+        :param output: Path of the merged file (default tickets.ndjson in directory).
+
+        :returns: The path of the merged file.
+        """
+        catch_up_from = None
+        if end_time is None:
+            end_time = catch_up_from = int(time.time())
+        return self.export(
+            split_range(
+                _unix_time(start_time), _unix_time(end_time), shards, PARTITION_BY_TIME
+            ),
+            output,
+            catch_up_from,
+        )
+
+    def export_id_range(
+        self,
+        first_id: int,
+        last_id: int,
+        shards: int = 8,
+        output: Optional[str] = None,
+    ) -> str:
+        """Export the tickets with ids from first_id to last_id, inclusive.
+
+        :returns: The path of the merged file.
+        """
+        return self.export(
+            split_range(first_id, last_id + 1, shards, PARTITION_BY_ID), output
+        )
+
+    def export(
+        self,
+        shards: List[ExportShard],
+        output: Optional[str] = None,
+        catch_up_from: Optional[int] = None,
+    ) -> str:
+        """Export shards, skipping ones already finished, then merge them.
+
+        :param catch_up_from: Unix time to export changes from once the shards
+            are done, up to the present. The export returns each ticket at the
+            time it last changed, so a ticket changed while the shards run moves
+            out of the one that would have returned it.
+
+        :returns: The path of the merged file.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        budget = None
+        if self.requests_per_minute:
+            budget = RateBudget(self.requests_per_minute)
+
+        if self.workers <= 1:
+            for shard in shards:
+                export_shard(
+                    shard,
+                    self.directory,
+                    self.class_path,
+                    self.manager_kwargs,
+                    self.checkpoint_every,
+                    budget,
+                )
+        else:
+            with ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(budget,),
+            ) as pool:
+                futures = [
+                    pool.submit(
+                        export_shard,
+                        shard,
+                        self.directory,
+                        self.class_path,
+                        self.manager_kwargs,
+                        self.checkpoint_every,
+                    )
+                    for shard in shards
+                ]
+                for future in futures:
+                    future.result()
+
+        if catch_up_from is not None:
+            catch_up = ExportShard(index=len(shards), start=catch_up_from, end=None)
+            export_shard(
+                catch_up,
+                self.directory,
+                self.class_path,
+                self.manager_kwargs,
+                self.checkpoint_every,
+                budget,
+            )
+            shards = shards + [catch_up]
+
+        output = output or os.path.join(self.directory, "tickets.ndjson")
+        count = self.merge(shards, output)
+        logger.debug(f"Exported {count} tickets from {len(shards)} shards")
+        return output
+
+    def merge(self, shards: List[ExportShard], output: str) -> int:
+        """Merge finished shard files into one, ordered by ticket id.
+
+        A ticket found in more than one shard, because it changed while they
+        were exported, is written once with its latest version.
+
+        :returns: How many tickets were written.
+        """
+        streams = [
+            _sorted_shard_lines(_shard_path(self.directory, shard), shard.index)
+            for shard in shards
+        ]
+        count = 0
+        with open(output + ".tmp", "wb") as f:
+            for _, versions in itertools.groupby(
+                heapq.merge(*streams), key=lambda version: version[0]
+            ):
+                latest = max(versions, key=lambda version: (version[2], version[1]))
+                f.write(latest[3])
+                count += 1
+        os.replace(output + ".tmp", output)
+        return count
+
+
+def split_range(
+    start: int, end: int, count: int, partition_by: str
+) -> List[ExportShard]:
+    """Split start to end, exclusive, into count shards of about equal size."""
+    count = max(1, min(count, end - start))
+    bounds = [start + (end - start) * i // count for i in range(count + 1)]
+    return [
+        ExportShard(
+            index=i, start=bounds[i], end=bounds[i + 1], partition_by=partition_by
+        )
+        for i in range(count)
+    ]
+
+
+_budget: Optional[RateBudget] = None
+
+
+def _init_worker(budget: Optional[RateBudget]) -> None:
+    global _budget
+    _budget = budget
+
+
+def export_shard(
+    shard: ExportShard,
+    directory: str,
+    class_path: str,
+    manager_kwargs: Dict[str, Any],
+    checkpoint_every: int = 100,
+    budget: Optional[RateBudget] = None,
+) -> int:
+    """Export one shard to its own file, resuming from its checkpoint.
+
+    :returns: How many tickets the finished shard holds.
+    """
+    checkpoint_path = _shard_path(directory, shard) + ".checkpoint.json"
+    checkpoint = {
+        "shard": dataclasses.asdict(shard),
+        "position": shard.start,
+        "offset": 0,
+        "count": 0,
+        "done": False,
+    }
+    if os.path.exists(checkpoint_path):
+        with open(checkpoint_path) as f:
+            checkpoint = json.load(f)
+        if checkpoint["shard"] != dataclasses.asdict(shard):
+            raise HelpDeskException(
+                f"{checkpoint_path} is for a different shard, export to a new directory"
+            )
+        if checkpoint["done"]:
+            logger.debug(f"Skipping finished {shard.name}")
+            return checkpoint["count"]
+
+    budget = budget or _budget
+    kwargs = dict(manager_kwargs)
+    if budget is not None:
+        kwargs["session"] = RateLimitedSession(budget)
+    manager = get_help_desk_interface(class_path)(**kwargs)
+
+    logger.debug(f"Exporting {shard.name} from {checkpoint['position']}")
+    with open(_shard_path(directory, shard), "a+b") as f:
+        # Drop anything written after the last checkpoint, it is read again.
+        f.truncate(checkpoint["offset"])
+        for tickets, position in _shard_pages(
+            manager, shard, checkpoint["position"], checkpoint_every
+        ):
+            for ticket in tickets:
+                f.write(ticket_to_line(ticket))
+            f.flush()
+            checkpoint["position"] = position
+            checkpoint["offset"] = f.tell()
+            checkpoint["count"] += len(tickets)
+            _write_checkpoint(checkpoint_path, checkpoint)
+
+    checkpoint["count"] = _sort_shard(_shard_path(directory, shard))
+    checkpoint["done"] = True
+    _write_checkpoint(checkpoint_path, checkpoint)
+    return checkpoint["count"]
+
+
+def _shard_pages(
+    manager, shard: ExportShard, position: int, checkpoint_every: int
+) -> Iterator[Tuple[List[HelpDeskTicket], int]]:
+    """Pages of a shard's tickets and the position to resume after each."""
+    if shard.partition_by == PARTITION_BY_ID:
+        for batch_start in range(position, shard.end, checkpoint_every):
+            batch_end = min(batch_start + checkpoint_every, shard.end)
+            yield manager.get_tickets(range(batch_start, batch_end)), batch_end
+        return
+
+    tickets = manager.iter_tickets(position, shard.end)
+    while True:
+        page = list(itertools.islice(tickets, checkpoint_every))
+        if not page:
+            return
+        # The export orders tickets by when they last changed, which is never
+        # before updated_at, so resuming from the latest updated_at only
+        # reads some tickets again.
+        for ticket in page:
+            updated_at = _updated_time(ticket.updated_at)
+            if updated_at is not None:
+                position = max(position, int(updated_at))
+        yield page, position
+
+
+def _sort_shard(path: str) -> int:
+    """Order a shard file by ticket id, keeping the last version written of each."""
+    with open(path, "rb") as f:
+        lines = {json.loads(line)["id"]: line for line in f}
+    with open(path + ".tmp", "wb") as f:
+        for ticket_id in sorted(lines):
+            f.write(lines[ticket_id])
+    os.replace(path + ".tmp", path)
+    return len(lines)
+
+
+def _sorted_shard_lines(
+    path: str, index: int
+) -> Iterator[Tuple[int, int, float, bytes]]:
+    """(id, shard index, updated time, line) for each ticket in a sorted shard."""
+    with open(path, "rb") as f:
+        for line in f:
+            record = json.loads(line)
+            updated_at = _updated_time(record.get("updated_at"))
+            yield record["id"], index, updated_at or float("-inf"), line
+
+
+def _write_checkpoint(path: str, checkpoint: Dict[str, Any]) -> None:
+    with open(path + ".tmp", "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(path + ".tmp", path)
+
+
+def _shard_path(directory: str, shard: ExportShard) -> str:
+    return os.path.join(directory, f"{shard.name}.ndjson")
+
+
+def _updated_time(value: Any) -> Optional[float]:
+    """A datetime or ISO 8601 string as a Unix time."""
+    value = parse_datetime(value)
+    if not isinstance(value, datetime.datetime):
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return value.timestamp()
+
+
+def _unix_time(value: Union[datetime.datetime, int]) -> int:
+    if isinstance(value, datetime.datetime):
+        return int(_updated_time(value))
+    return int(value)
@@ -0,0 +1,241 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
+
+from help_desk_client.interfaces import HelpDeskException
+
+
+logger = logging.getLogger(__name__)
+
+FINISHED_STATUSES = ("completed", "failed", "killed")
+SHOW_MANY_BATCH_SIZE = 100
+
+
+@dataclass
+class JobResult:
+    # The item sent at this result's index, e.g. a HelpDeskTicket.
+    item: Any
+    id: Optional[int] = None
+    success: bool = True
+    status: Optional[str] = None
+    error: Optional[str] = None
+    # The result as Zendesk returned it.
+    raw: Any = None
+
+    def get(self, key: str) -> Any:
+        """A value of the raw result, e.g. the email of a created user."""
+        return _result_value(self.raw, key)
+
+
+@dataclass
+class _TrackedJob:
+    future: "Future[List[JobResult]]"
+    items: Optional[Sequence[Any]]
+    deadline: float
+    progress: Any = None
+
+
+class ZendeskJobTracker:
+    """Wait for many Zendesk background jobs with one polling thread.
+
+    Jobs are polled together with job_statuses/show_many, 100 at a time. The
+    interval between polls starts at min_interval and doubles up to
+    max_interval while no job finishes or makes progress::
+
+        future = tracker.track(client.tickets.update(zendesk_tickets), tickets)
+        for result in future.result():
+            print(result.item.id, result.success)
+
+    The thread is started when a job is tracked and stops when none are left.
+    """
+
+    def __init__(
+        self,
+        client: Callable[[], Any],
+        timeout: float = 60,
+        min_interval: float = 0.5,
+        max_interval: float = 5,
+    ):
+        """Create a new tracker.
+
+        :param client: Callable giving the Zenpy client to poll with.
+        :param timeout: Seconds to wait for a job before failing it.
+        :param min_interval: Seconds between polls while jobs are progressing.
+        :param max_interval: Longest time between polls.
+        """
+        self.client = client
+        self.timeout = timeout
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self._condition = threading.Condition()
+        self._jobs: Dict[str, _TrackedJob] = {}
+        self._interval = min_interval
+        self._next_poll_at = 0.0
+        self._thread: Optional[threading.Thread] = None
+
+    def track(
+        self,
+        job_status: Union[str, Any],
+        items: Optional[Sequence[Any]] = None,
+        timeout: Optional[float] = None,
+    ) -> "Future[List[JobResult]]":
+        """Start waiting for a job.
+
+        :param job_status: JobStatus returned by a *_many call, or its id.
+        :param items: What was sent in the call, in order, to map results back to.
+        :param timeout: Seconds to wait for this job (default the tracker's).
+
+        :returns: Future of the job's JobResults, failing with HelpDeskException
+            if the job fails or does not finish in time.
+        """
+        job_id = job_status if isinstance(job_status, str) else job_status.id
+        future: "Future[List[JobResult]]" = Future()
+        job = _TrackedJob(
+            future=future,
+            items=list(items) if items is not None else None,
+            deadline=time.monotonic() + (timeout or self.timeout),
+        )
+        if not isinstance(job_status, str) and job_status.status in FINISHED_STATUSES:
+            self.__finish(job_id, job, job_status)
+            return future
+
+        with self._condition:
+            self._jobs[job_id] = job
+            self._interval = self.min_interval
+            self._next_poll_at = min(
+                self._next_poll_at or float("inf"),
+                time.monotonic() + self.min_interval,
+            )
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self.__run, name="zendesk-job-tracker", daemon=True
+                )
+                self._thread.start()
+            self._condition.notify()
+        return future
+
+    async def wait(
+        self,
+        job_status: Union[str, Any],
+        items: Optional[Sequence[Any]] = None,
+        timeout: Optional[float] = None,
+    ) -> List[JobResult]:
+        """Await a job from asyncio code, see track."""
+        # Imported here as it is slow to import and most callers never need it.
+        import asyncio
+
+        return await asyncio.wrap_future(self.track(job_status, items, timeout))
+
+    def pending(self) -> int:
+        """How many jobs are being waited for."""
+        with self._condition:
+            return len(self._jobs)
+
+    def __run(self) -> None:
+        while True:
+            with self._condition:
+                while self._jobs and time.monotonic() < self._next_poll_at:
+                    self._condition.wait(self._next_poll_at - time.monotonic())
+                if not self._jobs:
+                    self._thread = None
+                    self._next_poll_at = 0.0
+                    return
+                jobs = dict(self._jobs)
+
+            progressed = self.__poll(jobs)
+
+            with self._condition:
+                if progressed:
+                    self._interval = self.min_interval
+                else:
+                    self._interval = min(self._interval * 2, self.max_interval)
+                self._next_poll_at = time.monotonic() + self._interval
+
+    def __poll(self, jobs: Dict[str, _TrackedJob]) -> bool:
+        """Poll the jobs once, finishing those that are done.
+
+        :returns: Whether any job finished or made progress.
+        """
+        progressed = False
+        job_ids = list(jobs)
+        for start in range(0, len(job_ids), SHOW_MANY_BATCH_SIZE):
+            batch = job_ids[start : start + SHOW_MANY_BATCH_SIZE]
+            try:
+                job_statuses = list(self.client().job_status(ids=batch))
+            except Exception as e:
+                logger.warning(f"Could not poll Zendesk jobs {batch}: {e}")
+                continue
+
+            for job_status in job_statuses:
+                job = jobs.get(job_status.id)
+                if job is None:
+                    continue
+                if job_status.status in FINISHED_STATUSES:
+                    self.__finish(job_status.id, job, job_status)
+                    progressed = True
+                elif getattr(job_status, "progress", None) != job.progress:
+                    job.progress = job_status.progress
+                    progressed = True
+
+        now = time.monotonic()
+        for job_id, job in jobs.items():
+            if job.future.cancelled():
+                self.__forget(job_id)
+            elif not job.future.done() and now >= job.deadline:
+                self.__fail(job_id, job, "did not finish in time")
+        return progressed
+
+    def __fail(self, job_id: str, job: _TrackedJob, reason: str) -> None:
+        self.__forget(job_id)
+        if not job.future.set_running_or_notify_cancel():
+            return
+        message = f"Zendesk job {job_id} {reason}"
+        logger.error(message)
+        job.future.set_exception(HelpDeskException(message))
+
+    def __finish(self, job_id: str, job: _TrackedJob, job_status) -> None:
+        if job_status.status != "completed":
+            self.__fail(job_id, job, job_status.status)
+            return
+        self.__forget(job_id)
+        if not job.future.set_running_or_notify_cancel():
+            return
+
+        results = job_status.results or []
+        job.future.set_result(
+            [
+                self.__job_result(result, position, job.items)
+                for position, result in enumerate(results)
+            ]
+        )
+
+    def __forget(self, job_id: str) -> None:
+        with self._condition:
+            self._jobs.pop(job_id, None)
+
+    def __job_result(
+        self, result, position: int, items: Optional[Sequence[Any]]
+    ) -> JobResult:
+        index = _result_value(result, "index")
+        if index is None:
+            index = position
+        error = _result_value(result, "error")
+        success = _result_value(result, "success")
+        return JobResult(
+            item=items[index] if items is not None and index < len(items) else None,
+            id=_result_value(result, "id"),
+            success=error is None if success is None else bool(success),
+            status=_result_value(result, "status"),
+            error=_result_value(result, "details") or error,
+            raw=result,
+        )
+
+
+def _result_value(result, key: str) -> Any:
+    """Job results are JobStatusResult objects or plain dicts."""
+    if isinstance(result, dict):
+        return result.get(key)
+    return getattr(result, key, None)
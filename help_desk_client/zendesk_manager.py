@@ -1,4 +1,27 @@
+import copy
+import dataclasses
+import datetime
+import functools
+import itertools
 import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
 
 from zenpy import Zenpy
 from zenpy.lib import exception
@@ -6,40 +29,260 @@ from zenpy.lib.api_objects import Comment, CustomField, Ticket
 from zenpy.lib.api_objects import User as ZendeskUser
 
 from help_desk_client.interfaces import (
+    HelpDeskAttachment,
     HelpDeskBase,
     HelpDeskComment,
     HelpDeskCustomField,
     HelpDeskException,
     HelpDeskTicket,
+    HelpDeskTicketConflictException,
+    HelpDeskTicketDelta,
     HelpDeskTicketNotFoundException,
+    HelpDeskUnavailableException,
     HelpDeskUser,
+    HelpDeskUserDelta,
     Status,
 )
+from help_desk_client.resilience import (
+    CircuitBreaker,
+    LatencyTracker,
+    hedged_call,
+    is_backend_failure,
+)
+from help_desk_client.zendesk_jobs import JobResult, ZendeskJobTracker
+from help_desk_client.zendesk_schema import ZendeskSchema
 
 
 logger = logging.getLogger(__name__)
 
+# HelpDeskTicket fields that map one to one onto Zendesk ticket fields.
+TICKET_FIELD_MAP = {
+    "subject": "subject",
+    "description": "description",
+    "status": "status",
+    "recipient_email": "recipient",
+    "group_id": "group_id",
+    "external_id": "external_id",  # /PS-IGNORE
+    "assingee_id": "assingee_id",
+    "priority": "priority",
+    "tags": "tags",
+}
+SENDABLE_TICKET_FIELDS = set(TICKET_FIELD_MAP) | {"custom_fields", "user"}
+
+# Zendesk accepts at most 100 records per show_many or *_many call.
+MANY_BATCH_SIZE = 100
+
 
 class ZendeskClientNotFoundException(Exception):
     pass
 
 
+class UploadStream:
+    """File-like view of an upload source that is read as it is sent.
+
+    Zenpy closes what it uploads, so the caller's file object or mmap is
+    wrapped to keep it open. The length lets requests send a Content-Length
+    header rather than a chunked body.
+
+    Zenpy sends the same stream again after a 429, so once a read has reached
+    the end the next one starts over from where the upload started.
+    """
+
+    def __init__(self, fp):
+        self._fp = fp
+        self._start = fp.tell()
+        fp.seek(0, os.SEEK_END)
+        self._length = fp.tell() - self._start
+        fp.seek(self._start)
+        self._finished = False
+
+    def read(self, size: int = -1) -> bytes:
+        if self._finished:
+            self._fp.seek(self._start)
+            self._finished = False
+        data = self._fp.read(size)
+        if not data:
+            self._finished = True
+        return data
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __bool__(self) -> bool:
+        # An empty file is still a body, requests would send the JSON payload
+        # Zenpy passes alongside it instead.
+        return True
+
+
+def resilient(operation: str, idempotent: bool = False):
+    """Run a ZendeskManager method with its timeout, hedging and circuit breaker.
+
+    :param operation: Name the timeout and latencies are kept under.
+    :param idempotent: Whether the call is safe to send twice when hedging.
+    """
+
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            return self._call(
+                operation, functools.partial(method, self), args, kwargs, idempotent
+            )
+
+        return wrapper
+
+    return decorator
+
+
+def changed_ticket_fields(ticket: HelpDeskTicket, previous: HelpDeskTicket) -> Set[str]:
+    """Names of the HelpDeskTicket fields that differ between two tickets.
+
+    :param ticket: HelpDeskTicket with local changes.
+    :param previous: HelpDeskTicket as last known on the server.
+
+    :returns: Set of HelpDeskTicket field names.
+    """
+    return {
+        field.name
+        for field in dataclasses.fields(HelpDeskTicket)
+        if getattr(ticket, field.name) != getattr(previous, field.name)
+    }
+
+
+def merge_conflicting_tickets(
+    local: HelpDeskTicket,
+    server: HelpDeskTicket,
+    base: Optional[HelpDeskTicket] = None,
+) -> HelpDeskTicket:
+    """Default resolution of an update conflict.
+
+    The local changes win for scalar fields and custom fields are merged by id.
+    Tags the caller changed since base are kept as they are, so removed tags
+    stay removed, otherwise tags are unioned. The server's updated_at is carried
+    over so the retried update is stamped against the latest server version.
+
+    :param local: HelpDeskTicket the caller tried to write.
+    :param server: HelpDeskTicket as freshly read from Zendesk.
+    :param base: HelpDeskTicket the local changes were made against, None when
+        it isn't known.
+
+    :returns: The HelpDeskTicket to retry the update with.
+    """
+    tags_changed = base is not None and local.tags != base.tags
+    if server.tags and not tags_changed:
+        local.tags = list(dict.fromkeys((local.tags or []) + server.tags))
+
+    if server.custom_fields:
+        local_field_ids = {field.id for field in local.custom_fields or []}
+        local.custom_fields = (local.custom_fields or []) + [
+            field for field in server.custom_fields if field.id not in local_field_ids
+        ]
+
+    local.updated_at = server.updated_at
+    return local
+
+
 class ZendeskManager(HelpDeskBase):
     def __init__(self, **kwargs):
         """Create a new Zendesk client - pass credentials to.
 
         :param credentials: The credentials required to create client { token , email, subdomain }.
+            Optionally timeout, proactive_ratelimit and ratelimit_budget as taken by Zenpy.
+        :param session: requests Session for the Zenpy client, e.g. one sharing a
+            connection pool with other managers (default a new session).
+        :param safe_update: Send updates with Zendesk safe_update so concurrent
+            writes are rejected instead of overwritten (default False).
+        :param conflict_retries: How many times a conflicting update is refetched,
+            merged and retried before giving up (default 0).
+        :param conflict_resolver: Callable taking (local, server, base)
+            HelpDeskTickets, base None when it isn't known, and returning the
+            ticket to retry with (default merge_conflicting_tickets).
+        :param ticket_state_size: How many tickets' last known server state, and
+            how many ticket versions handed out, are kept so updates only send
+            changed fields (default 1000, 0 disables).
+        :param user_cache_size: How many users are kept so lookups by id don't need
+            an API call (default 1000, 0 disables).
+        :param job_timeout: Seconds to wait for Zendesk background jobs (default 60).
+            Jobs are waited for by the manager's jobs tracker, which bulk features
+            can also use, see ZendeskJobTracker.
+        :param upload_workers: How many attachments are uploaded at once (default 4).
+        :param timeouts: Seconds to wait on each request, by operation name, e.g.
+            {"get_ticket": 2, "get_or_create_users": 30}. Operations not listed
+            use the credentials timeout.
+        :param adaptive_timeouts: Lower each operation's timeout to
+            adaptive_timeout_factor times its observed p99 latency, but not below
+            adaptive_timeout_min seconds (default False).
+        :param hedge_reads: Send a duplicate of an idempotent read that has taken
+            longer than its observed p95 latency, the first answer wins (default False).
+        :param circuit_failure_threshold: Consecutive backend failures after which
+            calls fail fast for circuit_reset_timeout seconds (default None, disabled).
+        :param fallback: Callable taking (operation, *args, **kwargs) to answer calls
+            while the circuit is open, e.g. from a cache or mirror. Without one
+            HelpDeskUnavailableException is raised.
+        :param cached_reads: Answer get_ticket from the last known server state when
+            there is one, for when webhooks keep it fresh with apply_delta
+            (default False).
+        :param validate_fields: Check custom field values and group ids against the
+            cached schema before sending a ticket, see ZendeskSchema (default False).
+        :param schema_ttl: Seconds ticket field and group definitions are cached
+            for (default 3600).
         """
         if not kwargs.get("credentials", None):
             raise ZendeskClientNotFoundException("No Zendesk credentials provided")
 
+        self.safe_update: bool = kwargs.get("safe_update", False)
+        self.conflict_retries: int = kwargs.get("conflict_retries", 0)
+        self.conflict_resolver: Callable[
+            [HelpDeskTicket, HelpDeskTicket, Optional[HelpDeskTicket]], HelpDeskTicket
+        ] = kwargs.get("conflict_resolver", merge_conflicting_tickets)
+        self.ticket_state_size: int = kwargs.get("ticket_state_size", 1000)
+        # Guards the caches below, a manager may be shared between threads.
+        self._lock = threading.RLock()
+        self._ticket_states: "OrderedDict[int, HelpDeskTicket]" = OrderedDict()
+        # Tickets as handed out, by id and updated_at, so an update is compared
+        # with the version the caller edited rather than the newest one read.
+        self._ticket_versions: "OrderedDict[Tuple[int, Any], HelpDeskTicket]" = (
+            OrderedDict()
+        )
+        self.user_cache_size: int = kwargs.get("user_cache_size", 1000)
+        self._users: "OrderedDict[int, HelpDeskUser]" = OrderedDict()
+        self.job_timeout: float = kwargs.get("job_timeout", 60)
+        self.upload_workers: int = kwargs.get("upload_workers", 4)
+        self.jobs = ZendeskJobTracker(lambda: self.client, timeout=self.job_timeout)
+
+        self.timeout: float = kwargs.get("credentials").get("timeout", 5)
+        self.timeouts: Dict[str, float] = kwargs.get("timeouts", {})
+        self.adaptive_timeouts: bool = kwargs.get("adaptive_timeouts", False)
+        self.adaptive_timeout_factor: float = kwargs.get("adaptive_timeout_factor", 3)
+        self.adaptive_timeout_min: float = kwargs.get("adaptive_timeout_min", 0.5)
+        self.hedge_reads: bool = kwargs.get("hedge_reads", False)
+        self.latencies = LatencyTracker()
+        self.circuit_breaker: Optional[CircuitBreaker] = None
+        if kwargs.get("circuit_failure_threshold"):
+            self.circuit_breaker = CircuitBreaker(
+                failure_threshold=kwargs["circuit_failure_threshold"],
+                reset_timeout=kwargs.get("circuit_reset_timeout", 30),
+            )
+        self.fallback: Optional[Callable[..., Any]] = kwargs.get("fallback")
+        self.cached_reads: bool = kwargs.get("cached_reads", False)
+        self.validate_fields: bool = kwargs.get("validate_fields", False)
+        self.schema = ZendeskSchema(
+            lambda: self.client, ttl=kwargs.get("schema_ttl", 3600)
+        )
+        self._hedge_executor: Optional[ThreadPoolExecutor] = None
+        self._call_state = threading.local()
+
         self.client = Zenpy(
             timeout=kwargs.get("credentials").get("timeout", 5),
             email=kwargs.get("credentials")["email"],
             token=kwargs.get("credentials")["token"],
             subdomain=kwargs.get("credentials")["subdomain"],
+            proactive_ratelimit=kwargs.get("credentials").get("proactive_ratelimit"),
+            ratelimit_budget=kwargs.get("credentials").get("ratelimit_budget"),
+            session=kwargs.get("session"),
         )
+        self.__apply_operation_timeouts(self.client.users.session)
 
+    @resilient("get_or_create_user")
     def get_or_create_user(self, user: HelpDeskUser = None) -> HelpDeskUser:
         """Get or Create a new Zendesk user.   /PS-IGNORE
 
@@ -54,7 +297,10 @@ class ZendeskManager(HelpDeskBase):
         else:
             transformed_user = self.__transform_help_desk_user_to_zendesk_user(user)
 
-        if transformed_user.id:
+        cached_user = self.__cached_user(transformed_user.id)
+        if cached_user is not None:
+            return cached_user
+        elif transformed_user.id:
             zendesk_user = self.client.users(id=transformed_user.id)
         else:
             zendesk_user = self.client.users.create_or_update(transformed_user)
@@ -67,14 +313,83 @@ class ZendeskManager(HelpDeskBase):
             raise HelpDeskException(message)
         return self.__transform_zendesk_user_to_help_desk_user(zendesk_user)
 
+    @resilient("get_or_create_users")
+    def get_or_create_users(self, users: Iterable[HelpDeskUser]) -> List[HelpDeskUser]:
+        """Get or Create many Zendesk users in as few calls as possible.   /PS-IGNORE
+
+        Users with an id are looked up in the user cache and then with show_many,
+        the rest are deduplicated by email and sent to create_or_update_many.
+        Created users are matched to what was sent by each result's index, and
+        by the email the result echoes back when that fails.
+
+        :param users: HelpDeskUser instances with an id or an email.
+
+        :returns: HelpDeskUser instances in the same order as users.
+
+        :raises:
+            HelpDeskException: If a user can't be found or created.
+        """
+        users = list(users)
+        found: Dict[int, Optional[HelpDeskUser]] = {}
+        new_users: Dict[str, HelpDeskUser] = {}
+
+        for user in users:
+            if user.id:
+                found[user.id] = found.get(user.id) or self.__cached_user(user.id)
+            elif user.email:
+                new_users.setdefault(user.email.lower(), user)
+            else:
+                raise HelpDeskException("Cannot transform user to Zendesk user")
+
+        missing_ids = [user_id for user_id, user in found.items() if user is None]
+        for batch in self.__batches(missing_ids):
+            for zendesk_user in self.client.users(ids=batch):
+                found[
+                    zendesk_user.id
+                ] = self.__transform_zendesk_user_to_help_desk_user(zendesk_user)
+
+        user_ids_by_email: Dict[str, int] = {}
+        for batch in self.__batches(list(new_users.values())):
+            job_status = self.client.users.create_or_update(
+                [self.__transform_help_desk_user_to_zendesk_user(u) for u in batch]
+            )
+            for result in self.__wait_for_job(job_status, batch):
+                user = result.item
+                if user is None and result.get("email"):
+                    user = new_users.get(result.get("email").lower())
+                if user is None or not result.id:
+                    continue
+                user_ids_by_email[user.email.lower()] = result.id
+                found[result.id] = HelpDeskUser(
+                    id=result.id,
+                    full_name=user.full_name,
+                    email=result.get("email") or user.email,
+                )
+                self.__remember_user(found[result.id])
+
+        help_desk_users = []
+        for user in users:
+            user_id = user.id or user_ids_by_email.get(user.email.lower())
+            if found.get(user_id) is None:
+                message = f"No Zendesk user found for {user}"  # /PS-IGNORE
+                logger.debug(message)
+                raise HelpDeskException(message)
+            help_desk_users.append(dataclasses.replace(found[user_id]))
+        return help_desk_users
+
+    @resilient("create_ticket")
     def create_ticket(self, ticket: HelpDeskTicket) -> HelpDeskTicket:
         """Create a new Zendesk ticket in response to a new user question.
 
         :param ticket: HelpDeskTicket with information to create Zendesk ticket.
 
         :returns: A HelpDeskTicket instance.
-        """
 
+        :raises:
+            HelpDeskValidationException: If validate_fields is set and a custom field
+                value or the group is not valid.
+        """
+        self.__validate_ticket(ticket)
         zendesk_audit = self.client.tickets.create(
             self.__transform_help_desk_to_zendesk_ticket(ticket)
         )
@@ -90,6 +405,23 @@ class ZendeskManager(HelpDeskBase):
         :raises:
             HelpDeskTicketNotFoundException: If no ticket is found.
         """
+        if self.cached_reads:
+            with self._lock:
+                ticket = self._ticket_states.get(ticket_id)
+                if ticket is not None:
+                    self.__remember_ticket_version(ticket)
+                    return copy.deepcopy(ticket)
+
+        return self.__fetch_ticket(ticket_id)
+
+    @resilient("get_ticket", idempotent=True)
+    def __fetch_ticket(self, ticket_id: int) -> HelpDeskTicket:
+        """Read a ticket from Zendesk, never from the cache.
+
+        :param ticket_id: The Zendesk ID of the Ticket.
+
+        :returns: A HelpDeskTicket instance.
+        """
         logger.debug(f"Look for Ticket by is Zendesk ID:<{ticket_id}>")  # /PS-IGNORE
         try:
             return self.__transform_zendesk_to_help_desk_ticket(
@@ -103,6 +435,56 @@ class ZendeskManager(HelpDeskBase):
             logger.debug(message)
             raise HelpDeskTicketNotFoundException(message)
 
+    @resilient("get_tickets", idempotent=True)
+    def get_tickets(self, ticket_ids: Iterable[int]) -> List[HelpDeskTicket]:
+        """Recover many tickets by Zendesk ID, with one show_many call per 100.
+
+        Requesters are side loaded, so they don't need an API call each.
+
+        :param ticket_ids: The Zendesk IDs of the Tickets.
+
+        :returns: HelpDeskTicket instances for the tickets that exist, in the
+            order Zendesk returns them.
+        """
+        tickets = []
+        for batch in self.__batches(list(ticket_ids)):
+            logger.debug(f"Look for Tickets by Zendesk IDs:<{batch}>")  # /PS-IGNORE
+            tickets.extend(
+                self.__transform_zendesk_to_help_desk_ticket(ticket)
+                for ticket in self.client.tickets(ids=batch, include="users")
+            )
+        return tickets
+
+    def iter_tickets(
+        self,
+        start_time: Union[datetime.datetime, int],
+        end_time: Optional[Union[datetime.datetime, int]] = None,
+    ) -> Iterator[HelpDeskTicket]:
+        """Lazily yield the tickets last changed between start_time and end_time.
+
+        Tickets are read with the incremental export, a page at a time, in the
+        order they last changed. Requesters are side loaded.
+
+        :param start_time: Datetime or Unix time to export from.
+        :param end_time: Datetime or Unix time to export up to, exclusive
+            (default no end).
+
+        :returns: Iterator of HelpDeskTicket instances.
+        """
+        start = self.__unix_time(start_time)
+        end = self.__unix_time(end_time) if end_time is not None else None
+        logger.debug(f"Exporting tickets changed from:<{start}> to:<{end}>")
+
+        for ticket in self.client.tickets.incremental(
+            start_time=start, include="users"
+        ):
+            changed_at = self.__changed_at(ticket)
+            if end is not None and changed_at is not None and changed_at >= end:
+                return
+            if changed_at is not None and changed_at < start:
+                continue
+            yield self.__transform_zendesk_to_help_desk_ticket(ticket)
+
     def close_ticket(self, ticket_id: int) -> HelpDeskTicket:
         """Close a ticket in Zendesk.
 
@@ -134,19 +516,262 @@ class ZendeskManager(HelpDeskBase):
         ticket.comment = comment
         return self.update_ticket(ticket)
 
-    def update_ticket(self, ticket: HelpDeskTicket) -> HelpDeskTicket:
+    def update_ticket(
+        self, ticket: HelpDeskTicket, safe_update: Optional[bool] = None
+    ) -> HelpDeskTicket:
         """Update an existing ticket.
 
         :param ticket: HelpDeskTicket ticket.
+        :param safe_update: Override the manager's safe_update setting for this call.
 
         :returns: The updated HelpDeskTicket instance.
 
         :raises:
             HelpDeskTicketNotFoundException: If no ticket is found.
+            HelpDeskTicketConflictException: If the ticket changed on the server
+                since it was read and the conflict retries are exhausted.
         """
-        ticket_audit = self.client.tickets.update(
-            self.__transform_help_desk_to_zendesk_ticket(ticket)
+        if safe_update is None:
+            safe_update = self.safe_update
+
+        attempt = 0
+        while True:
+            try:
+                return self.__update_ticket(ticket, safe_update)
+            except HelpDeskTicketConflictException:
+                if attempt >= self.conflict_retries:
+                    raise
+                attempt += 1
+                logger.debug(
+                    f"Retrying update of ticket:<{ticket.id}> after conflict "
+                    f"(attempt {attempt} of {self.conflict_retries})"
+                )
+                base = self.__ticket_base(ticket)
+                server_ticket = self.__fetch_ticket(ticket.id)
+                if base is not None:
+                    ticket = self.__rebase_ticket(ticket, base, server_ticket)
+                ticket = self.conflict_resolver(ticket, server_ticket, base)
+
+    def apply_delta(self, delta: Union[HelpDeskTicketDelta, HelpDeskUserDelta]) -> None:
+        """Apply a change pushed by Zendesk to the ticket state and user caches.
+
+        Changes to tickets and users that aren't held are ignored, and ticket
+        changes older than the state held are dropped as delivered out of order.
+
+        :param delta: HelpDeskTicketDelta or HelpDeskUserDelta instance.
+        """
+        if isinstance(delta, HelpDeskUserDelta):
+            with self._lock:
+                if delta.deleted:
+                    self._users.pop(delta.user_id, None)
+                elif delta.user_id in self._users:
+                    self._users[delta.user_id] = dataclasses.replace(
+                        self._users[delta.user_id], **delta.changes
+                    )
+            return
+
+        with self._lock:
+            if delta.deleted:
+                self._ticket_states.pop(delta.ticket_id, None)
+                return
+
+            state = self._ticket_states.get(delta.ticket_id)
+            if state is None:
+                return
+
+            held_at = self.__timestamp(state.updated_at)
+            changed_at = self.__timestamp(delta.updated_at)
+            if held_at and changed_at and changed_at < held_at:
+                logger.debug(f"Ignoring stale change to ticket:<{delta.ticket_id}>")
+                return
+
+            self._ticket_states[delta.ticket_id] = dataclasses.replace(
+                state, **delta.changes
+            )
+
+    def iter_comments(
+        self, ticket_id: int, include_authors: bool = False
+    ) -> Iterator[HelpDeskComment]:
+        """Lazily yield the comments on a ticket, oldest first.
+
+        Comments are read with cursor pagination, a page at a time.
+
+        :param ticket_id: The Zendesk ID of the Ticket.
+        :param include_authors: Load the comment authors into the user cache,
+            with one show_many call per page of comments.
+
+        :returns: Iterator of HelpDeskComment instances.
+
+        :raises:
+            HelpDeskTicketNotFoundException: If no ticket is found.
+        """
+        for _, comment in self.iter_comments_for_tickets([ticket_id], include_authors):
+            yield comment
+
+    def iter_comments_for_tickets(
+        self, ticket_ids: Iterable[int], include_authors: bool = False
+    ) -> Iterator[Tuple[int, HelpDeskComment]]:
+        """Lazily yield (ticket_id, comment) for the comments on many tickets.
+
+        When include_authors is set, authors are loaded a page at a time across
+        ticket boundaries, so many short conversations share show_many calls.
+
+        :param ticket_ids: The Zendesk IDs of the Tickets.
+        :param include_authors: Load the comment authors into the user cache.
+
+        :returns: Iterator of (ticket_id, HelpDeskComment) tuples.
+
+        :raises:
+            HelpDeskTicketNotFoundException: If a ticket is not found.
+        """
+        comments = self.__iter_zendesk_comments(ticket_ids)
+        if not include_authors:
+            yield from comments
+            return
+
+        while True:
+            page = list(itertools.islice(comments, MANY_BATCH_SIZE))
+            if not page:
+                return
+            author_ids = {
+                comment.author_id
+                for _, comment in page
+                if comment.author_id and comment.author_id not in self._users
+            }
+            if author_ids:
+                self.get_or_create_users(HelpDeskUser(id=i) for i in author_ids)
+            yield from page
+
+    @resilient("upload_attachment")
+    def upload_attachment(
+        self, attachment: HelpDeskAttachment, token: Optional[str] = None
+    ) -> str:
+        """Upload an attachment to Zendesk.
+
+        File objects and mmaps are streamed from their current position and are
+        left open, paths are opened and closed here.
+
+        :param attachment: HelpDeskAttachment with file_name and content.
+        :param token: Upload token from an earlier upload to add this file to.
+
+        :returns: The upload token to put on a comment.
+        """
+        logger.debug(f"Uploading attachment:<{attachment.file_name}>")
+        content = attachment.content
+        if isinstance(content, (str, os.PathLike)):
+            with open(content, "rb") as fp:
+                upload = self.__upload(attachment, UploadStream(fp), token)
+        elif hasattr(content, "read"):
+            upload = self.__upload(attachment, UploadStream(content), token)
+        else:
+            upload = self.__upload(attachment, content, token)
+
+        zendesk_attachment = getattr(upload, "attachment", None)
+        if zendesk_attachment is not None:
+            attachment.id = zendesk_attachment.id
+            attachment.content_url = getattr(zendesk_attachment, "content_url", None)
+            attachment.content_type = getattr(zendesk_attachment, "content_type", None)
+            attachment.size = getattr(zendesk_attachment, "size", None)
+        return upload.token
+
+    def upload_attachments(
+        self, attachments: Iterable[HelpDeskAttachment], token: Optional[str] = None
+    ) -> Optional[str]:
+        """Upload many attachments to Zendesk under one upload token.
+
+        Without a token the first file is uploaded on its own to get one, the
+        rest are then uploaded in parallel, upload_workers at a time.
+
+        :param attachments: HelpDeskAttachment instances with file_name and content.
+        :param token: Upload token from an earlier upload to add these files to.
+
+        :returns: The upload token to put on a comment.
+        """
+        attachments = list(attachments)
+        if not attachments:
+            return token
+        if token is None:
+            token = self.upload_attachment(attachments.pop(0))
+
+        with ThreadPoolExecutor(max_workers=self.upload_workers) as executor:
+            # Consume the results so any upload error is raised here.
+            list(
+                executor.map(
+                    lambda attachment: self.upload_attachment(attachment, token),
+                    attachments,
+                )
+            )
+        return token
+
+    def __upload(self, attachment: HelpDeskAttachment, data, token: Optional[str]):
+        """Send one upload request to Zendesk."""
+        return self.client.attachments.upload(
+            data,
+            token=token,
+            target_name=attachment.file_name,
+            content_type=attachment.content_type,
         )
+
+    def __iter_zendesk_comments(
+        self, ticket_ids: Iterable[int]
+    ) -> Iterator[Tuple[int, HelpDeskComment]]:
+        """Yield (ticket_id, comment) straight from the comments endpoint."""
+        for ticket_id in ticket_ids:
+            logger.debug(f"Reading comments for ticket:<{ticket_id}>")
+            try:
+                for zendesk_comment in self.client.tickets.comments(ticket_id):
+                    yield ticket_id, self.__transform_zendesk_to_help_desk_comment(
+                        zendesk_comment
+                    )
+            except exception.RecordNotFoundException:
+                message = (
+                    f"Could not find Zendesk ticket with ID:<{ticket_id}>"  # /PS-IGNORE
+                )
+                logger.debug(message)
+                raise HelpDeskTicketNotFoundException(message)
+
+    @resilient("update_ticket")
+    def __update_ticket(
+        self, ticket: HelpDeskTicket, safe_update: bool
+    ) -> HelpDeskTicket:
+        """Send a single update for a ticket.
+
+        :param ticket: HelpDeskTicket ticket.
+        :param safe_update: Whether to guard the update with the ticket's updated_at.
+
+        :returns: The updated HelpDeskTicket instance.
+        """
+        previous = self.__ticket_base(ticket)
+        self.__validate_ticket(ticket, previous)
+        if previous is None:
+            zendesk_ticket = self.__transform_help_desk_to_zendesk_ticket(ticket)
+        else:
+            zendesk_ticket = self.__transform_changed_help_desk_to_zendesk_ticket(
+                ticket, previous
+            )
+            if zendesk_ticket is None:
+                logger.debug(f"No changes to send for ticket:<{ticket.id}>")
+                return ticket
+
+        if safe_update:
+            if not ticket.updated_at:
+                raise HelpDeskException(
+                    f"Cannot safely update ticket {ticket.id} without updated_at"
+                )
+            zendesk_ticket.safe_update = True
+            zendesk_ticket.updated_stamp = self.__format_updated_stamp(
+                ticket.updated_at
+            )
+
+        try:
+            ticket_audit = self.client.tickets.update(zendesk_ticket)
+        except exception.APIException as e:
+            if getattr(e.response, "status_code", None) == 409:
+                message = f"Ticket {ticket.id} was updated by someone else"
+                logger.debug(message)
+                raise HelpDeskTicketConflictException(message) from e
+            raise
+
         if ticket_audit is None:
             message = f"Could not update ticket with id  {ticket.id}"
             logger.error(message)
@@ -154,6 +779,347 @@ class ZendeskManager(HelpDeskBase):
 
         return self.__transform_zendesk_to_help_desk_ticket(ticket_audit.ticket)
 
+    def _call(
+        self,
+        operation: str,
+        call: Callable[..., Any],
+        args: tuple,
+        kwargs: dict,
+        idempotent: bool,
+    ) -> Any:
+        """Make a call with the operation's timeout, hedging and circuit breaker.
+
+        Calls made from within another call, like the user lookup while creating
+        a ticket, use their own timeout but only the outer call counts towards
+        the circuit breaker.
+
+        :param operation: Name the timeout and latencies are kept under.
+        :param call: The call to make.
+        :param args: Positional arguments for the call.
+        :param kwargs: Keyword arguments for the call.
+        :param idempotent: Whether the call is safe to send twice when hedging.
+
+        :returns: The result of the call, or of the fallback when the circuit is open.
+
+        :raises:
+            HelpDeskUnavailableException: If the circuit is open and there is no fallback.
+        """
+        outermost = not getattr(self._call_state, "depth", 0)
+        if outermost and self.circuit_breaker and not self.circuit_breaker.allow():
+            logger.warning(f"Zendesk circuit is open, not calling {operation}")
+            if self.fallback:
+                return self.fallback(operation, *args, **kwargs)
+            raise HelpDeskUnavailableException(
+                f"Zendesk is unavailable, {operation} was not called"
+            )
+
+        timeout = self.__operation_timeout(operation)
+
+        def attempt():
+            state = self._call_state
+            previous_timeout = getattr(state, "timeout", None)
+            state.timeout = timeout
+            state.depth = getattr(state, "depth", 0) + 1
+            start = time.monotonic()
+            try:
+                result = call(*args, **kwargs)
+            finally:
+                state.timeout = previous_timeout
+                state.depth -= 1
+            self.latencies.record(operation, time.monotonic() - start)
+            return result
+
+        hedge_delay = None
+        if idempotent and self.hedge_reads:
+            hedge_delay = self.latencies.percentile(operation, 95)
+
+        try:
+            if hedge_delay is None:
+                result = attempt()
+            else:
+                result = hedged_call(attempt, hedge_delay, self.__hedge_executor())
+        except Exception as e:
+            if outermost and self.circuit_breaker:
+                if is_backend_failure(e):
+                    self.circuit_breaker.record_failure()
+                else:
+                    self.circuit_breaker.release_trial()
+            raise
+
+        if outermost and self.circuit_breaker:
+            self.circuit_breaker.record_success()
+        return result
+
+    def __operation_timeout(self, operation: str) -> float:
+        """Seconds to wait on each request made for an operation."""
+        timeout = self.timeouts.get(operation, self.timeout)
+        if self.adaptive_timeouts:
+            p99 = self.latencies.percentile(operation, 99)
+            if p99 is not None:
+                timeout = min(
+                    timeout,
+                    max(self.adaptive_timeout_min, p99 * self.adaptive_timeout_factor),
+                )
+        return timeout
+
+    def __hedge_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._hedge_executor is None:
+                self._hedge_executor = ThreadPoolExecutor(
+                    thread_name_prefix="zendesk-hedge"
+                )
+            return self._hedge_executor
+
+    def __apply_operation_timeouts(self, session) -> None:
+        """Make the session use the current operation's timeout.
+
+        Zenpy passes its one client wide timeout to every request, this swaps in
+        the timeout _call set for the operation running on this thread.
+        """
+        request = session.request
+
+        @functools.wraps(request)
+        def request_with_operation_timeout(method, url, **kwargs):
+            timeout = getattr(self._call_state, "timeout", None)
+            if timeout is not None:
+                kwargs["timeout"] = timeout
+            return request(method, url, **kwargs)
+
+        session.request = request_with_operation_timeout
+
+    def __validate_ticket(
+        self, ticket: HelpDeskTicket, previous: Optional[HelpDeskTicket] = None
+    ) -> None:
+        """Check and convert the ticket's custom fields and group when validating.
+
+        Only what will be sent is checked, so values already on the server, such
+        as those of fields deactivated since, don't stop an update.
+
+        :param ticket: HelpDeskTicket instance, its custom fields are replaced
+            with the converted values.
+        :param previous: HelpDeskTicket as last known on the server, None for a
+            ticket sent in full.
+
+        :raises:
+            HelpDeskValidationException: If a custom field value or the group is
+                not valid.
+        """
+        if not self.validate_fields:
+            return
+
+        previous_values = {
+            custom_field.id: custom_field.value
+            for custom_field in getattr(previous, "custom_fields", None) or []
+        }
+        if ticket.custom_fields:
+            changed = [
+                custom_field
+                for custom_field in ticket.custom_fields
+                if custom_field.id not in previous_values
+                or previous_values[custom_field.id] != custom_field.value
+            ]
+            converted = {
+                custom_field.id: custom_field
+                for custom_field in self.schema.validate_custom_fields(changed)
+            }
+            ticket.custom_fields = [
+                converted.get(custom_field.id, custom_field)
+                for custom_field in ticket.custom_fields
+            ]
+        if previous is None or ticket.group_id != previous.group_id:
+            self.schema.validate_group(ticket.group_id)
+
+    def __timestamp(self, value) -> Optional[datetime.datetime]:
+        """A datetime or Zendesk ISO 8601 string as an aware datetime."""
+        if isinstance(value, str):
+            value = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+        if isinstance(value, datetime.datetime) and value.tzinfo is None:
+            value = value.replace(tzinfo=datetime.timezone.utc)
+        return value
+
+    def __unix_time(self, value: Union[datetime.datetime, int]) -> int:
+        if isinstance(value, datetime.datetime):
+            return int(self.__timestamp(value).timestamp())
+        return int(value)
+
+    def __changed_at(self, ticket: Ticket) -> Optional[int]:
+        """When an exported ticket last changed, as the export orders them."""
+        generated_timestamp = getattr(ticket, "generated_timestamp", None)
+        if generated_timestamp is not None:
+            return int(generated_timestamp)
+        updated_at = self.__timestamp(getattr(ticket, "updated_at", None))
+        return int(updated_at.timestamp()) if updated_at else None
+
+    def __format_updated_stamp(self, updated_at) -> str:
+        """Format an updated_at value as a Zendesk updated_stamp.
+
+        :param updated_at: datetime or the ISO 8601 string returned by Zendesk.
+
+        :returns: ISO 8601 UTC timestamp string.
+        """
+        if isinstance(updated_at, datetime.datetime):
+            if updated_at.tzinfo is not None:
+                updated_at = updated_at.astimezone(datetime.timezone.utc)
+            return updated_at.strftime("%Y-%m-%dT%H:%M:%SZ")
+        return updated_at
+
+    def __batches(self, items: list) -> Iterable[list]:
+        """Split items into chunks Zendesk accepts in a single *_many call."""
+        for start in range(0, len(items), MANY_BATCH_SIZE):
+            yield items[start : start + MANY_BATCH_SIZE]
+
+    def __wait_for_job(
+        self, job_status, items: Optional[Sequence[Any]] = None
+    ) -> List[JobResult]:
+        """Wait for a Zendesk background job with the job tracker.
+
+        :param job_status: JobStatus returned by a *_many call.
+        :param items: What was sent, in order, to map the results back to.
+
+        :returns: JobResult instances for the job's results.
+
+        :raises:
+            HelpDeskException: If the job fails or does not finish in job_timeout.
+        """
+        return self.jobs.track(job_status, items).result()
+
+    def __remember_user(self, user: HelpDeskUser) -> None:
+        """Keep a copy of a user returned by Zendesk.
+
+        :param user: HelpDeskUser instance.
+        """
+        if not self.user_cache_size or not user.id:
+            return
+
+        with self._lock:
+            self._users[user.id] = dataclasses.replace(user)
+            self._users.move_to_end(user.id)
+            while len(self._users) > self.user_cache_size:
+                self._users.popitem(last=False)
+
+    def __cached_user(self, user_id: Optional[int]) -> Optional[HelpDeskUser]:
+        """Copy of a cached user, so callers can't change the cache."""
+        with self._lock:
+            user = self._users.get(user_id)
+            if user is None:
+                return None
+            self._users.move_to_end(user_id)
+            return dataclasses.replace(user)
+
+    def __remember_ticket_state(self, ticket: HelpDeskTicket) -> None:
+        """Keep a copy of the ticket as last returned by Zendesk.
+
+        :param ticket: HelpDeskTicket instance.
+        """
+        if not self.ticket_state_size or not ticket.id:
+            return
+
+        state = copy.deepcopy(ticket)
+        with self._lock:
+            self._ticket_states[ticket.id] = state
+            self._ticket_states.move_to_end(ticket.id)
+            while len(self._ticket_states) > self.ticket_state_size:
+                self._ticket_states.popitem(last=False)
+            self.__remember_ticket_version(state)
+
+    def __remember_ticket_version(self, ticket: HelpDeskTicket) -> None:
+        """Keep a ticket as handed out, for updates made to it later.
+
+        :param ticket: HelpDeskTicket instance, not changed afterwards.
+        """
+        if not self.ticket_state_size or not ticket.id:
+            return
+
+        key = (ticket.id, self.__timestamp(ticket.updated_at))
+        with self._lock:
+            self._ticket_versions[key] = ticket
+            self._ticket_versions.move_to_end(key)
+            while len(self._ticket_versions) > self.ticket_state_size:
+                self._ticket_versions.popitem(last=False)
+
+    def __ticket_base(self, ticket: HelpDeskTicket) -> Optional[HelpDeskTicket]:
+        """The server version of a ticket that the caller's changes were made to.
+
+        :param ticket: HelpDeskTicket with local changes.
+
+        :returns: HelpDeskTicket instance, or None when the version the ticket
+            was read at isn't held.
+        """
+        with self._lock:
+            return self._ticket_versions.get(
+                (ticket.id, self.__timestamp(ticket.updated_at))
+            )
+
+    def __rebase_ticket(
+        self, ticket: HelpDeskTicket, base: HelpDeskTicket, server: HelpDeskTicket
+    ) -> HelpDeskTicket:
+        """Apply the local changes made since base on top of the server ticket.
+
+        :param ticket: HelpDeskTicket with local changes.
+        :param base: HelpDeskTicket the local changes were made against.
+        :param server: HelpDeskTicket as freshly read from Zendesk.
+
+        :returns: HelpDeskTicket instance.
+        """
+        rebased = copy.deepcopy(server)
+        for field_name in changed_ticket_fields(ticket, base) - {"updated_at"}:
+            setattr(rebased, field_name, getattr(ticket, field_name))
+        return rebased
+
+    def __transform_changed_help_desk_to_zendesk_ticket(
+        self, ticket: HelpDeskTicket, previous: HelpDeskTicket
+    ) -> Optional[Ticket]:
+        """Transform the changes to a HelpDeskTicket into a minimal Zendesk ticket.
+
+        :param ticket: HelpDeskTicket instance.
+        :param previous: HelpDeskTicket as last known on the server.
+
+        :returns: Zendesk ticket instance, or None if nothing changed.
+        """
+        changed = changed_ticket_fields(ticket, previous)
+        send_comment = ticket.comment is not None and "comment" in changed
+        if not changed & SENDABLE_TICKET_FIELDS and not send_comment:
+            return None
+
+        zendesk_ticket = Ticket(id=ticket.id)
+
+        for field_name in changed & TICKET_FIELD_MAP.keys():
+            setattr(
+                zendesk_ticket,
+                TICKET_FIELD_MAP[field_name],
+                getattr(ticket, field_name),
+            )
+
+        if "custom_fields" in changed:
+            previous_values = {
+                custom_field.id: custom_field.value
+                for custom_field in previous.custom_fields or []
+            }
+            zendesk_ticket.custom_fields = [
+                CustomField(id=custom_field.id, value=custom_field.value)
+                for custom_field in ticket.custom_fields or []
+                if custom_field.id not in previous_values
+                or previous_values[custom_field.id] != custom_field.value
+            ]
+
+        ticket_user = None
+        if "user" in changed or (send_comment and not ticket.comment.author_id):
+            if ticket.user and ticket.user.id:
+                ticket_user = ticket.user
+            else:
+                ticket_user = self.get_or_create_user(ticket.user)
+
+        if "user" in changed:
+            zendesk_ticket.requester_id = ticket_user.id
+            zendesk_ticket.submitter_id = ticket_user.id
+
+        if send_comment:
+            zendesk_ticket.comment = self.__transform_help_desk_to_zendesk_comment(
+                ticket.comment, ticket_user
+            )
+
+        return zendesk_ticket
+
     def __transform_help_desk_to_zendesk_ticket(self, ticket: HelpDeskTicket) -> Ticket:
         """Transform from HelpDeskTicket to Zendesk ticket instance.
 
@@ -171,12 +1137,8 @@ class ZendeskManager(HelpDeskBase):
             ]
 
         if ticket.comment:
-            comment = Comment(
-                body=ticket.comment.body,
-                author_id=ticket.comment.author_id
-                if ticket.comment.author_id
-                else ticket_user.id,
-                public=ticket.comment.public,
+            comment = self.__transform_help_desk_to_zendesk_comment(
+                ticket.comment, ticket_user
             )
 
         ticket = Ticket(
@@ -219,7 +1181,7 @@ class ZendeskManager(HelpDeskBase):
         if getattr(ticket, "custom_fields", None):
             custom_fields = [
                 HelpDeskCustomField(id=custom_field["id"], value=custom_field["value"])
-                for custom_field in ticket.custom_fields
+                for custom_field in map(self.__custom_field_dict, ticket.custom_fields)
             ]
 
         if getattr(ticket, "comment", None):
@@ -247,8 +1209,80 @@ class ZendeskManager(HelpDeskBase):
             custom_fields=custom_fields,
             comment=comment,
         )
+        self.__remember_ticket_state(help_desk_ticket)
         return help_desk_ticket
 
+    def __transform_help_desk_to_zendesk_comment(
+        self, comment: HelpDeskComment, ticket_user: Optional[HelpDeskUser]
+    ) -> Comment:
+        """Transform HelpDeskComment into Zendesk comment instance.
+
+        Attachments that have content but no id yet are uploaded first.
+
+        :param comment: HelpDeskComment instance.
+        :param ticket_user: HelpDeskUser to author the comment if it has no author_id.
+
+        :returns: Zendesk comment instance.
+        """
+        pending = [
+            attachment
+            for attachment in comment.attachments or []
+            if attachment.id is None and attachment.content is not None
+        ]
+        if pending:
+            comment.upload_token = self.upload_attachments(
+                pending, comment.upload_token
+            )
+
+        zendesk_comment = Comment(
+            body=comment.body,
+            author_id=comment.author_id if comment.author_id else ticket_user.id,
+            public=comment.public,
+        )
+        if comment.upload_token:
+            zendesk_comment.uploads = [comment.upload_token]
+        return zendesk_comment
+
+    def __transform_zendesk_to_help_desk_comment(
+        self, comment: Comment
+    ) -> HelpDeskComment:
+        """Transform Zendesk comment into HelpDeskComment instance.
+
+        :param comment: Zendesk comment instance.
+
+        :returns: HelpDeskComment instance.
+        """
+        attachments = None
+
+        if getattr(comment, "attachments", None):
+            attachments = [
+                HelpDeskAttachment(
+                    id=attachment.id,
+                    file_name=attachment.file_name,
+                    content_url=getattr(attachment, "content_url", None),
+                    content_type=getattr(attachment, "content_type", None),
+                    size=getattr(attachment, "size", None),
+                )
+                for attachment in comment.attachments
+            ]
+
+        return HelpDeskComment(
+            id=getattr(comment, "id", None),
+            body=comment.body,
+            author_id=getattr(comment, "author_id", None),
+            public=getattr(comment, "public", True),
+            created_at=getattr(comment, "created_at", None),
+            attachments=attachments,
+        )
+
+    def __custom_field_dict(self, custom_field) -> dict:
+        """Custom fields come back from the API as dicts, but may be CustomField
+        instances when a ticket object is passed straight through.
+        """
+        if isinstance(custom_field, CustomField):
+            return custom_field.to_dict()
+        return custom_field
+
     def __transform_help_desk_user_to_zendesk_user(
         self, user: HelpDeskUser
     ) -> ZendeskUser:
@@ -277,4 +1311,6 @@ class ZendeskManager(HelpDeskBase):
 
         :returns: ZendeskUser instance.
         """
-        return HelpDeskUser(id=user.id, full_name=user.name, email=user.email)
+        help_desk_user = HelpDeskUser(id=user.id, full_name=user.name, email=user.email)
+        self.__remember_user(help_desk_user)
+        return help_desk_user
@@ -0,0 +1,161 @@
+import dataclasses
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from zenpy import Zenpy
+
+from help_desk_client.interfaces import HelpDeskException
+from help_desk_client.zendesk_manager import ZendeskManager
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class TenantStats:
+    api_calls: int = 0
+    api_errors: int = 0
+    api_seconds: float = 0.0
+    managers_created: int = 0
+    last_used: Optional[float] = None
+
+
+class ZendeskManagerPool:
+    """ZendeskManagers for many Zendesk subdomains sharing one connection pool.
+
+    Each tenant keeps its own credentials, rate limit budget and caches, but all
+    of their HTTP sessions are mounted on one bounded HTTPAdapter, so sockets and
+    TLS sessions are reused rather than opened per manager. Managers are built on
+    first use and the least recently used are dropped once max_tenants is reached
+    or once they have been idle for idle_timeout seconds.
+    """
+
+    def __init__(
+        self,
+        max_tenants: int = 50,
+        idle_timeout: Optional[float] = None,
+        pool_connections: Optional[int] = None,
+        pool_maxsize: int = 10,
+        **manager_kwargs,
+    ):
+        """Create a new pool.
+
+        :param max_tenants: How many tenants' managers are kept at once.
+        :param idle_timeout: Seconds after which an unused manager is dropped.
+        :param pool_connections: How many hosts' connection pools are kept
+            (default max_tenants, each subdomain is its own host).
+        :param pool_maxsize: How many connections are kept per host.
+        :param manager_kwargs: Defaults passed to every ZendeskManager.
+        """
+        self.max_tenants = max_tenants
+        self.idle_timeout = idle_timeout
+        self.manager_kwargs = manager_kwargs
+        self.adapter = HTTPAdapter(
+            pool_connections=pool_connections or max_tenants,
+            pool_maxsize=pool_maxsize,
+            **Zenpy.http_adapter_kwargs(),
+        )
+        self._lock = threading.Lock()
+        self._tenants: Dict[str, dict] = {}
+        self._managers: "OrderedDict[str, ZendeskManager]" = OrderedDict()
+        self._stats: Dict[str, TenantStats] = {}
+        # Stats are updated from response hooks, outside of _lock.
+        self._stats_lock = threading.Lock()
+
+    def register(self, tenant: str, credentials: dict, **manager_kwargs) -> None:
+        """Add a tenant, or replace its settings.
+
+        :param tenant: Name for the tenant, e.g. its subdomain.
+        :param credentials: ZendeskManager credentials for the tenant.
+        :param manager_kwargs: ZendeskManager arguments for this tenant only.
+        """
+        with self._lock:
+            self._tenants[tenant] = dict(
+                self.manager_kwargs, credentials=credentials, **manager_kwargs
+            )
+            self._stats.setdefault(tenant, TenantStats())
+            self._managers.pop(tenant, None)
+
+    def unregister(self, tenant: str) -> None:
+        """Remove a tenant and its manager."""
+        with self._lock:
+            self._tenants.pop(tenant, None)
+            self._managers.pop(tenant, None)
+            self._stats.pop(tenant, None)
+
+    def get(self, tenant: str) -> ZendeskManager:
+        """Give access to the manager for a tenant, building it if needed.
+
+        :param tenant: Name the tenant was registered with.
+
+        :returns: ZendeskManager instance.
+
+        :raises:
+            HelpDeskException: If the tenant is not registered.
+        """
+        with self._lock:
+            self._evict_idle()
+            if tenant not in self._tenants:
+                raise HelpDeskException(f"Unknown help desk tenant {tenant}")
+
+            stats = self._stats[tenant]
+            with self._stats_lock:
+                stats.last_used = time.monotonic()
+
+            manager = self._managers.get(tenant)
+            if manager is None:
+                manager = ZendeskManager(
+                    session=self._session(stats), **self._tenants[tenant]
+                )
+                stats.managers_created += 1
+                self._managers[tenant] = manager
+                while len(self._managers) > self.max_tenants:
+                    evicted, _ = self._managers.popitem(last=False)
+                    logger.debug(f"Evicted help desk tenant:<{evicted}>")
+            self._managers.move_to_end(tenant)
+            return manager
+
+    def stats(self) -> Dict[str, TenantStats]:
+        """Usage so far for each registered tenant."""
+        with self._lock, self._stats_lock:
+            return {
+                tenant: dataclasses.replace(stats)
+                for tenant, stats in self._stats.items()
+            }
+
+    def _session(self, stats: TenantStats) -> requests.Session:
+        """New session on the shared adapter that records usage in stats.
+
+        Dropped sessions are not closed, that would close the shared adapter.
+        """
+        session = requests.Session()
+        session.mount("https://", self.adapter)
+
+        def record(response, *args, **kwargs):
+            with self._stats_lock:
+                stats.api_calls += 1
+                stats.api_seconds += response.elapsed.total_seconds()
+                if response.status_code >= 400:
+                    stats.api_errors += 1
+
+        session.hooks["response"].append(record)
+        return session
+
+    def _evict_idle(self) -> None:
+        """Drop managers that have not been used for idle_timeout seconds."""
+        if self.idle_timeout is None:
+            return
+
+        cutoff = time.monotonic() - self.idle_timeout
+        while self._managers:
+            tenant = next(iter(self._managers))
+            if self._stats[tenant].last_used > cutoff:
+                break
+            del self._managers[tenant]
+            logger.debug(f"Evicted idle help desk tenant:<{tenant}>")
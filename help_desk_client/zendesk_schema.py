@@ -0,0 +1,251 @@
+import datetime
+import decimal
+import logging
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from help_desk_client.interfaces import (
+    HelpDeskCustomField,
+    HelpDeskFieldOption,
+    HelpDeskGroup,
+    HelpDeskTicketField,
+    HelpDeskValidationException,
+)
+
+
+logger = logging.getLogger(__name__)
+
+CHECKBOX_VALUES = {
+    "true": True,
+    "1": True,
+    "yes": True,
+    "false": False,
+    "0": False,
+    "no": False,
+    "": False,
+}
+# Field types whose values are text, values of other types, e.g. lookup
+# relationship ids, are passed through as they are.
+TEXT_FIELD_TYPES = {"text", "textarea", "regexp"}
+
+
+class ZendeskSchema:
+    """Ticket field, custom field option and group definitions held for a while.
+
+    Everything is loaded together on first use and reloaded on the first use
+    after ttl seconds, or straight away with refresh().
+    """
+
+    def __init__(self, client: Callable[[], Any], ttl: float = 3600):
+        """Create a new schema cache.
+
+        :param client: Callable giving the Zenpy client to load definitions with.
+        :param ttl: Seconds the definitions are used for before being reloaded.
+        """
+        self.client = client
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._loaded_at: Optional[float] = None
+        self._ticket_fields: Dict[int, HelpDeskTicketField] = {}
+        self._groups: Dict[int, HelpDeskGroup] = {}
+
+    def refresh(self) -> None:
+        """Reload the definitions from Zendesk."""
+        client = self.client()
+        ticket_fields = {
+            field.id: self.__transform_ticket_field(field)
+            for field in client.ticket_fields()
+        }
+        groups = {
+            group.id: HelpDeskGroup(id=group.id, name=group.name)
+            for group in client.groups()
+        }
+        with self._lock:
+            self._ticket_fields = ticket_fields
+            self._groups = groups
+            self._loaded_at = time.monotonic()
+        logger.debug(
+            f"Loaded {len(ticket_fields)} ticket fields and {len(groups)} groups"
+        )
+
+    def ticket_fields(self) -> List[HelpDeskTicketField]:
+        self.__load()
+        return list(self._ticket_fields.values())
+
+    def ticket_field(self, field_id: int) -> Optional[HelpDeskTicketField]:
+        self.__load()
+        return self._ticket_fields.get(field_id)
+
+    def find_ticket_field(self, title: str) -> Optional[HelpDeskTicketField]:
+        """Ticket field by its title, ignoring case."""
+        self.__load()
+        for field in self._ticket_fields.values():
+            if field.title.lower() == title.lower():
+                return field
+        return None
+
+    def groups(self) -> List[HelpDeskGroup]:
+        self.__load()
+        return list(self._groups.values())
+
+    def group(self, group_id: int) -> Optional[HelpDeskGroup]:
+        self.__load()
+        return self._groups.get(group_id)
+
+    def find_group(self, name: str) -> Optional[HelpDeskGroup]:
+        """Group by its name, ignoring case."""
+        self.__load()
+        for group in self._groups.values():
+            if group.name.lower() == name.lower():
+                return group
+        return None
+
+    def validate_custom_fields(
+        self, custom_fields: List[HelpDeskCustomField]
+    ) -> List[HelpDeskCustomField]:
+        """Check custom field values against their definitions.
+
+        :param custom_fields: HelpDeskCustomField instances to check.
+
+        :returns: New HelpDeskCustomField instances, values in the form Zendesk
+            returns them, e.g. option values rather than option names.
+
+        :raises:
+            HelpDeskValidationException: If a field is unknown, inactive or its value
+                is not valid for the field.
+        """
+        return [
+            HelpDeskCustomField(
+                id=custom_field.id,
+                value=self.coerce(custom_field.id, custom_field.value),
+            )
+            for custom_field in custom_fields
+        ]
+
+    def validate_group(self, group_id: Optional[int]) -> None:
+        """Check a group exists.
+
+        :raises:
+            HelpDeskValidationException: If there is no group with that id.
+        """
+        if group_id is not None and self.group(group_id) is None:
+            raise HelpDeskValidationException(f"Unknown group {group_id}")
+
+    def coerce(self, field_id: int, value: Any) -> Any:
+        """Check and convert one custom field value.
+
+        :raises:
+            HelpDeskValidationException: If the value is not valid for the field.
+        """
+        field = self.ticket_field(field_id)
+        if field is None:
+            raise HelpDeskValidationException(f"Unknown ticket field {field_id}")
+        if not field.active:
+            raise HelpDeskValidationException(f"Ticket field {field_id} is inactive")
+        if value is None:
+            return None
+
+        try:
+            return self.__coerce(field, value)
+        except (ValueError, TypeError, decimal.InvalidOperation) as e:
+            raise HelpDeskValidationException(
+                f"{value!r} is not valid for {field.type} field {field.title} "
+                f"({field.id}): {e}"
+            ) from e
+
+    def __coerce(self, field: HelpDeskTicketField, value: Any) -> Any:
+        if field.type == "checkbox":
+            if isinstance(value, bool):
+                return value
+            if str(value).lower() not in CHECKBOX_VALUES:
+                raise ValueError("expected true or false")
+            return CHECKBOX_VALUES[str(value).lower()]
+
+        if field.type == "integer":
+            if isinstance(value, bool) or not re.fullmatch(
+                r"-?\d+", str(value).strip()
+            ):
+                raise ValueError("expected a whole number")
+            return str(int(value))
+
+        if field.type == "decimal":
+            if isinstance(value, bool):
+                raise ValueError("expected a number")
+            number = decimal.Decimal(str(value))
+            if not number.is_finite():
+                raise ValueError("expected a number")
+            return str(number)
+
+        if field.type == "date":
+            if isinstance(value, datetime.datetime):
+                value = value.date()
+            if isinstance(value, datetime.date):
+                return value.isoformat()
+            return datetime.date.fromisoformat(value).isoformat()
+
+        if field.type == "tagger":
+            return self.__option_value(field, value)
+
+        if field.type == "multiselect":
+            values = [value] if isinstance(value, str) else list(value)
+            return [self.__option_value(field, v) for v in values]
+
+        if field.type not in TEXT_FIELD_TYPES:
+            return value
+        if not isinstance(value, str):
+            raise TypeError("expected text")
+        if field.type == "regexp" and field.regexp_for_validation:
+            try:
+                pattern = re.compile(field.regexp_for_validation)
+            except re.error:
+                # Zendesk patterns are Ruby regular expressions, e.g. \z and \h,
+                # leave those Python can't read for Zendesk to check.
+                logger.debug(f"Not checking field:<{field.id}> against its pattern")
+                return value
+            if not pattern.fullmatch(value):
+                raise ValueError(f"does not match {field.regexp_for_validation}")
+        return value
+
+    def __option_value(self, field: HelpDeskTicketField, value: Any) -> str:
+        """The option value for an option value or name."""
+        for option in field.options or []:
+            if value == option.value or (
+                isinstance(value, str) and value.lower() == option.name.lower()
+            ):
+                return option.value
+        raise ValueError("not one of the field's options")
+
+    def __load(self) -> None:
+        loaded_at = self._loaded_at
+        if loaded_at is None or time.monotonic() - loaded_at >= self.ttl:
+            self.refresh()
+
+    def __transform_ticket_field(self, field) -> HelpDeskTicketField:
+        options = None
+        if getattr(field, "custom_field_options", None):
+            options = [
+                HelpDeskFieldOption(
+                    id=self.__value(option, "id"),
+                    name=self.__value(option, "name"),
+                    value=self.__value(option, "value"),
+                )
+                for option in field.custom_field_options
+            ]
+
+        return HelpDeskTicketField(
+            id=field.id,
+            title=field.title,
+            type=field.type,
+            required=bool(getattr(field, "required", False)),
+            active=getattr(field, "active", True) is not False,
+            options=options,
+            regexp_for_validation=getattr(field, "regexp_for_validation", None),
+        )
+
+    def __value(self, option, key: str):
+        """Options are CustomFieldOption objects or plain dicts."""
+        if isinstance(option, dict):
+            return option.get(key)
+        return getattr(option, key, None)
@@ -0,0 +1,191 @@
+import base64
+import datetime
+import hashlib
+import hmac
+import json
+import logging
+from typing import Any, Dict, List, Mapping, Optional, Union
+
+from help_desk_client.interfaces import (
+    HelpDeskBase,
+    HelpDeskTicketDelta,
+    HelpDeskUserDelta,
+)
+
+
+logger = logging.getLogger(__name__)
+
+SIGNATURE_HEADER = "x-zendesk-webhook-signature"
+TIMESTAMP_HEADER = "x-zendesk-webhook-signature-timestamp"
+
+# Zendesk event detail fields and the HelpDeskTicket fields they map onto.
+TICKET_DETAIL_MAP = {
+    "subject": "subject",
+    "description": "description",
+    "status": "status",
+    "priority": "priority",
+    "type": "ticket_type",
+    "tags": "tags",
+    "group_id": "group_id",
+    "assignee_id": "assingee_id",
+    "external_id": "external_id",  # /PS-IGNORE
+    "due_at": "due_at",
+    "created_at": "created_at",
+    "updated_at": "updated_at",
+}
+# Fields sent as names, e.g. "OPEN", that the API returns in lower case.
+LOWER_CASE_DETAILS = {"status", "priority", "type"}
+
+USER_DETAIL_MAP = {
+    "name": "full_name",
+    "email": "email",
+}
+
+DELETE_EVENTS = {"deleted", "soft_deleted", "permanently_deleted"}
+
+Delta = Union[HelpDeskTicketDelta, HelpDeskUserDelta]
+
+
+class ZendeskWebhookSignatureException(Exception):
+    pass
+
+
+class ZendeskWebhookHandler:
+    """Turn Zendesk webhook requests into deltas and apply them to a help desk.
+
+    The handler knows nothing of web frameworks, give it the request headers and
+    raw body from whichever one receives the webhook::
+
+        handler = ZendeskWebhookHandler(secret, help_desk=zendesk_manager)
+        handler.handle(request.headers, request.body)
+
+    Both event subscription webhooks ({"type": "zen:event-type:ticket...",
+    "detail": {...}}) and trigger webhooks whose body is {"ticket": {...}} or
+    {"user": {...}} are understood.
+    """
+
+    def __init__(
+        self,
+        secret: str,
+        help_desk: Optional[HelpDeskBase] = None,
+        max_age: Optional[float] = 300,
+    ):
+        """Create a new handler.
+
+        :param secret: The webhook's signing secret.
+        :param help_desk: HelpDeskBase to apply the deltas to.
+        :param max_age: Seconds after which a signed request is refused as a replay
+            (default 300, None to accept any age).
+        """
+        self.secret = secret.encode()
+        self.help_desk = help_desk
+        self.max_age = max_age
+
+    def handle(self, headers: Mapping[str, str], body: bytes) -> List[Delta]:
+        """Verify, parse and apply a webhook request.
+
+        :param headers: The request headers, in any case.
+        :param body: The raw request body.
+
+        :returns: The deltas that were applied.
+
+        :raises:
+            ZendeskWebhookSignatureException: If the request is not signed by Zendesk.
+        """
+        self.verify(headers, body)
+        deltas = self.parse(body)
+        if self.help_desk is not None:
+            for delta in deltas:
+                self.help_desk.apply_delta(delta)
+        return deltas
+
+    def verify(self, headers: Mapping[str, str], body: bytes) -> None:
+        """Check the request was signed with the webhook's secret.
+
+        :raises:
+            ZendeskWebhookSignatureException: If the signature is missing, wrong or
+                too old.
+        """
+        headers = {key.lower(): value for key, value in headers.items()}
+        signature = headers.get(SIGNATURE_HEADER)
+        timestamp = headers.get(TIMESTAMP_HEADER)
+        if not signature or not timestamp:
+            raise ZendeskWebhookSignatureException("Webhook request is not signed")
+
+        expected = base64.b64encode(
+            hmac.new(self.secret, timestamp.encode() + body, hashlib.sha256).digest()
+        ).decode()
+        if not hmac.compare_digest(expected, signature):
+            raise ZendeskWebhookSignatureException("Webhook signature does not match")
+
+        if self.max_age is not None:
+            signed_at = datetime.datetime.fromisoformat(
+                timestamp.replace("Z", "+00:00")
+            )
+            if signed_at.tzinfo is None:
+                signed_at = signed_at.replace(tzinfo=datetime.timezone.utc)
+            age = datetime.datetime.now(datetime.timezone.utc) - signed_at
+            if age.total_seconds() > self.max_age:
+                raise ZendeskWebhookSignatureException("Webhook request is too old")
+
+    def parse(self, body: Union[bytes, str]) -> List[Delta]:
+        """Parse a webhook body into deltas, unknown events give none.
+
+        :param body: The raw request body.
+
+        :returns: HelpDeskTicketDelta and HelpDeskUserDelta instances.
+        """
+        payload = json.loads(body)
+
+        event_type = payload.get("type", "")
+        if event_type.startswith("zen:event-type:"):
+            object_type, _, change = event_type[len("zen:event-type:") :].partition(".")
+            detail = payload.get("detail") or {}
+        elif "ticket" in payload:
+            object_type, change, detail = "ticket", "updated", payload["ticket"]
+        elif "user" in payload:
+            object_type, change, detail = "user", "updated", payload["user"]
+        else:
+            logger.debug("Ignoring webhook without a ticket or user")
+            return []
+
+        if not detail.get("id"):
+            logger.debug(f"Ignoring {event_type or object_type} webhook without an id")
+            return []
+
+        if object_type == "ticket":
+            return [self.__ticket_delta(detail, change in DELETE_EVENTS)]
+        elif object_type == "user":
+            return [self.__user_delta(detail, change in DELETE_EVENTS)]
+
+        logger.debug(f"Ignoring {event_type} webhook")
+        return []
+
+    def __ticket_delta(
+        self, detail: Dict[str, Any], deleted: bool
+    ) -> HelpDeskTicketDelta:
+        changes: Dict[str, Any] = {}
+        for key, name in TICKET_DETAIL_MAP.items():
+            if key in detail:
+                value = detail[key]
+                if key in LOWER_CASE_DETAILS and isinstance(value, str):
+                    value = value.lower()
+                changes[name] = value
+
+        return HelpDeskTicketDelta(
+            ticket_id=int(detail["id"]),
+            changes=changes,
+            deleted=deleted,
+            updated_at=detail.get("updated_at"),
+        )
+
+    def __user_delta(self, detail: Dict[str, Any], deleted: bool) -> HelpDeskUserDelta:
+        return HelpDeskUserDelta(
+            user_id=int(detail["id"]),
+            changes={
+                name: detail[key]
+                for key, name in USER_DETAIL_MAP.items()
+                if key in detail
+            },
+            deleted=deleted,
+        )
@@ -0,0 +1,162 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+
+import requests
+from requests.adapters import BaseAdapter
+
+from help_desk_client.bench import parse_mix, run_bench
+from help_desk_client.cli import main
+from help_desk_client.interfaces import (
+    HelpDeskException,
+    HelpDeskStubbed,
+    HelpDeskTicket,
+)
+
+
+class FakeAdapter(BaseAdapter):
+    def send(self, request, **kwargs):
+        response = requests.Response()
+        response.status_code = 200
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+class RequestingHelpDesk(HelpDeskStubbed):
+    """Stubbed help desk that sends two requests for each get_ticket."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.session = requests.Session()
+        self.session.mount("https://", FakeAdapter())
+
+    def get_ticket(self, ticket_id):
+        self.session.get(f"https://example.test/tickets/{ticket_id}")
+        self.session.get(f"https://example.test/tickets/{ticket_id}/comments")
+        return super().get_ticket(ticket_id)
+
+
+class BackgroundRequestingHelpDesk(RequestingHelpDesk):
+    """Stubbed help desk that also sends a request from a thread of its own."""
+
+    def get_ticket(self, ticket_id):
+        thread = threading.Thread(
+            target=self.session.get, args=(f"https://example.test/jobs/{ticket_id}",)
+        )
+        thread.start()
+        thread.join()
+        return super().get_ticket(ticket_id)
+
+
+class TestBench(unittest.TestCase):
+    def test_parse_mix(self):
+        assert parse_mix("create=1, get=5,close") == {
+            "create": 1.0,
+            "get": 5.0,
+            "close": 1.0,
+        }
+
+        for mix in ("create=1,delete=1", "get=often", "create=0"):
+            with self.subTest(mix=mix):
+                with self.assertRaises(HelpDeskException):
+                    parse_mix(mix)
+
+    def test_run_bench_stubbed(self):
+        report = run_bench(
+            "help_desk_client.interfaces.HelpDeskStubbed",
+            concurrency=3,
+            duration=5,
+            max_operations=200,
+            seed=1,
+        )
+
+        assert report["operations"] == 200
+        assert report["errors"] == 0
+        assert set(report["by_operation"]) == {"create", "get", "comment", "close"}
+        create = report["by_operation"]["create"]
+        assert sum(bucket["count"] for bucket in create["histogram_ms"]) == (
+            create["count"]
+        )
+        assert create["latency_ms"]["p50"] <= create["latency_ms"]["max"]
+
+    def test_run_bench_counts_api_calls(self):
+        report = run_bench(
+            "tests.test_bench.RequestingHelpDesk",
+            mix={"create": 1, "get": 3},
+            concurrency=2,
+            duration=5,
+            max_operations=100,
+        )
+
+        get = report["by_operation"]["get"]
+        assert get["api_calls"] == 2 * get["count"]
+        assert get["api_calls_per_operation"] == 2
+        assert report["by_operation"]["create"]["api_calls"] == 0
+        assert report["api_calls"] == get["api_calls"]
+        assert report["unattributed_api_calls"] == 0
+
+    def test_run_bench_counts_api_calls_from_other_threads(self):
+        report = run_bench(
+            "tests.test_bench.BackgroundRequestingHelpDesk",
+            mix={"create": 1, "get": 3},
+            concurrency=2,
+            duration=5,
+            max_operations=100,
+        )
+
+        get = report["by_operation"]["get"]
+        assert get["api_calls"] == 2 * get["count"]
+        assert report["unattributed_api_calls"] == get["count"]
+        assert report["api_calls"] == 3 * get["count"]
+
+    def test_stubbed_ids_are_unique_across_threads(self):
+        help_desk = HelpDeskStubbed()
+
+        def create_tickets():
+            for _ in range(200):
+                help_desk.create_ticket(HelpDeskTicket(subject="subject"))
+
+        threads = [threading.Thread(target=create_tickets) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert sorted(help_desk._tickets) == list(range(1, 801))
+
+
+class TestCli(unittest.TestCase):
+    def test_bench_writes_json_report(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, "report.json")
+            assert (
+                main(
+                    [
+                        "bench",
+                        "--mix",
+                        "create=1,get=1",
+                        "--concurrency",
+                        "1",
+                        "--max-operations",
+                        "10",
+                        "--output",
+                        output,
+                    ]
+                )
+                == 0
+            )
+
+            with open(output) as f:
+                report = json.load(f)
+        assert report["class_path"] == "help_desk_client.interfaces.HelpDeskStubbed"
+        assert report["operations"] == 10
+
+    def test_error_bench_unknown_operation(self):
+        with self.assertRaises(SystemExit) as context:
+            main(["bench", "--mix", "delete=1", "--duration", "0.1"])
+        assert context.exception.code == 2
@@ -0,0 +1,96 @@
+import subprocess
+import sys
+import threading
+import unittest
+
+import help_desk_client
+from help_desk_client import (
+    clear_help_desk_managers,
+    get_help_desk_interface,
+    get_help_desk_manager,
+)
+from help_desk_client.interfaces import HelpDeskBase, HelpDeskStubbed
+from help_desk_client.zendesk_manager import ZendeskManager
+
+
+class TestHelpDeskClient(unittest.TestCase):
+    def setUp(self):
+        clear_help_desk_managers()
+
+    def test_get_help_desk_interface(self):
+        cls = get_help_desk_interface("help_desk_client.interfaces.HelpDeskStubbed")
+
+        assert cls is HelpDeskStubbed
+
+    def test_help_desk_base_import(self):
+        from help_desk_client import HelpDeskBase as ExportedHelpDeskBase
+
+        assert ExportedHelpDeskBase is HelpDeskBase
+
+    def test_import_does_not_load_backends(self):
+        result = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "import sys, help_desk_client; print('zenpy' in sys.modules)",
+            ],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+
+        assert result.stdout.strip() == "False"
+
+    def test_get_help_desk_manager_is_shared(self):
+        credentials = {
+            "email": "test@example.com",  # test email /PS-IGNORE
+            "token": "token123",
+            "subdomain": "subdomain123",
+        }
+        manager = get_help_desk_manager(
+            "help_desk_client.zendesk_manager.ZendeskManager", credentials=credentials
+        )
+
+        assert isinstance(manager, ZendeskManager)
+        assert manager is get_help_desk_manager(
+            "help_desk_client.zendesk_manager.ZendeskManager",
+            credentials=dict(credentials),
+        )
+        assert manager is not get_help_desk_manager(
+            "help_desk_client.zendesk_manager.ZendeskManager",
+            credentials=dict(credentials, subdomain="other"),
+        )
+
+    def test_get_help_desk_manager_threads_share_one_instance(self):
+        managers = []
+
+        def get_manager():
+            managers.append(
+                get_help_desk_manager("help_desk_client.interfaces.HelpDeskStubbed")
+            )
+
+        threads = [threading.Thread(target=get_manager) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len({id(manager) for manager in managers}) == 1
+
+    def test_clear_help_desk_managers(self):
+        manager = get_help_desk_manager("help_desk_client.interfaces.HelpDeskStubbed")
+        clear_help_desk_managers()
+
+        assert manager is not get_help_desk_manager(
+            "help_desk_client.interfaces.HelpDeskStubbed"
+        )
+
+    def test_get_help_desk_manager_with_callable_is_not_kept(self):
+        def get_manager():
+            return get_help_desk_manager(
+                "help_desk_client.interfaces.HelpDeskStubbed",
+                options={"fallback": lambda *args: None},
+            )
+
+        assert get_manager() is not get_manager()
+        assert help_desk_client._managers == {}
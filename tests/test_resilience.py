@@ -0,0 +1,156 @@
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import requests
+from zenpy.lib import exception
+
+from help_desk_client.resilience import (
+    CircuitBreaker,
+    LatencyTracker,
+    hedged_call,
+    is_backend_failure,
+)
+
+
+class FakeResponse(object):
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class TestLatencyTracker(unittest.TestCase):
+    def test_percentile(self):
+        tracker = LatencyTracker(window=100, min_samples=10)
+        for i in range(1, 101):
+            tracker.record("get_ticket", i / 100)
+
+        assert tracker.percentile("get_ticket", 50) == 0.51
+        assert tracker.percentile("get_ticket", 95) == 0.96
+        assert tracker.percentile("get_ticket", 100) == 1.0
+
+    def test_percentile_needs_min_samples(self):
+        tracker = LatencyTracker(min_samples=10)
+        for _ in range(9):
+            tracker.record("get_ticket", 0.1)
+
+        assert tracker.percentile("get_ticket", 95) is None
+        assert tracker.percentile("create_ticket", 95) is None
+
+    def test_window(self):
+        tracker = LatencyTracker(window=10, min_samples=1)
+        for _ in range(10):
+            tracker.record("get_ticket", 5)
+        for _ in range(10):
+            tracker.record("get_ticket", 1)
+
+        assert tracker.percentile("get_ticket", 100) == 1
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    @mock.patch("help_desk_client.resilience.time.monotonic")
+    def test_opens_and_recovers(self, monotonic):
+        monotonic.return_value = 100
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+
+        breaker.record_failure()
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        assert not breaker.allow()
+
+        monotonic.return_value = 131
+        assert breaker.allow()
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert not breaker.allow()
+
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+        assert breaker.allow()
+
+    @mock.patch("help_desk_client.resilience.time.monotonic")
+    def test_failed_trial_opens_again(self, monotonic):
+        monotonic.return_value = 100
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+        breaker.record_failure()
+
+        monotonic.return_value = 131
+        assert breaker.allow()
+        breaker.record_failure()
+
+        assert breaker.state == CircuitBreaker.OPEN
+        assert not breaker.allow()
+
+    @mock.patch("help_desk_client.resilience.time.monotonic")
+    def test_released_trial_lets_another_through(self, monotonic):
+        monotonic.return_value = 100
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+        breaker.record_failure()
+
+        monotonic.return_value = 131
+        assert breaker.allow()
+        breaker.release_trial()
+
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert breaker.allow()
+        assert not breaker.allow()
+
+    def test_success_resets_failures(self):
+        breaker = CircuitBreaker(failure_threshold=2)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+
+        assert breaker.state == CircuitBreaker.CLOSED
+
+
+class TestHedgedCall(unittest.TestCase):
+    def test_duplicate_sent_after_delay(self):
+        calls = []
+        lock = threading.Lock()
+
+        def call():
+            with lock:
+                calls.append(None)
+                first = len(calls) == 1
+            if first:
+                time.sleep(1)
+                return "slow"
+            return "fast"
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            start = time.monotonic()
+            result = hedged_call(call, 0.05, executor)
+            elapsed = time.monotonic() - start
+
+        assert result == "fast"
+        assert elapsed < 0.5
+        assert len(calls) == 2
+
+    def test_no_duplicate_when_fast(self):
+        calls = []
+
+        def call():
+            calls.append(None)
+            return "fast"
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            assert hedged_call(call, 1, executor) == "fast"
+
+        assert len(calls) == 1
+
+
+class TestIsBackendFailure(unittest.TestCase):
+    def test_is_backend_failure(self):
+        assert is_backend_failure(requests.exceptions.ConnectTimeout())
+        assert is_backend_failure(
+            exception.APIException("error", response=FakeResponse(503))
+        )
+        assert is_backend_failure(
+            exception.APIException("error", response=FakeResponse(429))
+        )
+        assert not is_backend_failure(
+            exception.RecordNotFoundException("error", response=FakeResponse(404))
+        )
+        assert not is_backend_failure(ValueError())
@@ -0,0 +1,146 @@
+import datetime
+import importlib.util
+import io
+import os
+import tempfile
+import unittest
+
+from help_desk_client.interfaces import (
+    HelpDeskComment,
+    HelpDeskCustomField,
+    HelpDeskException,
+    HelpDeskTicket,
+    HelpDeskUser,
+    Priority,
+    Status,
+    TicketType,
+)
+from help_desk_client.ticket_files import (
+    NDJSONTicketWriter,
+    ParquetTicketWriter,
+    read_tickets,
+    write_tickets,
+)
+
+
+HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+
+def make_tickets(count: int):
+    """Generate tickets, so nothing holds them all at once."""
+    for ticket_id in range(1, count + 1):
+        yield HelpDeskTicket(
+            id=ticket_id,
+            subject=f"subject{ticket_id}",
+            description="Field: value",
+            user=HelpDeskUser(
+                id=1234,
+                full_name="Jim Example",
+                email="test@example.com",  # test email /PS-IGNORE
+            ),
+            group_id=100,
+            tags=["a", f"tag{ticket_id}"],
+            custom_fields=[
+                HelpDeskCustomField(id=1, value="data_workspace"),
+                HelpDeskCustomField(id=2, value=f"value{ticket_id}"),
+            ],
+            created_at=datetime.datetime(
+                2022, 8, 1, 10, 30, tzinfo=datetime.timezone.utc
+            ),
+            updated_at=datetime.datetime(
+                2022, 8, 2, 9, 0, tzinfo=datetime.timezone.utc
+            ),
+            status=Status.OPEN,
+            priority=Priority.NORMAL,
+            ticket_type=TicketType.QUESTION,
+            comment=HelpDeskComment(body="comment", author_id=1234),
+        )
+
+
+class TestTicketFiles(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory.name, name)
+
+    def test_ndjson_round_trip(self):
+        path = self.path("tickets.ndjson")
+        assert write_tickets(make_tickets(25), path) == 25
+
+        assert list(read_tickets(path)) == list(make_tickets(25))
+
+    def test_ndjson_writer_leaves_file_open(self):
+        f = io.BytesIO()
+        with NDJSONTicketWriter(f) as writer:
+            writer.write_all(make_tickets(2))
+
+        assert not f.closed
+        assert f.getvalue().count(b"\n") == 2
+        assert b'"status": "open"' in f.getvalue()
+
+    def test_read_empty_file(self):
+        path = self.path("empty.ndjson")
+        open(path, "wb").close()
+
+        assert list(read_tickets(path)) == []
+
+    def test_error_unknown_format(self):
+        with self.assertRaises(HelpDeskException):
+            write_tickets(make_tickets(1), self.path("tickets.csv"), format="csv")
+
+
+@unittest.skipUnless(HAS_PYARROW, "pyarrow is not installed")
+class TestParquetTicketFiles(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, "tickets.parquet")
+
+    def test_parquet_round_trip(self):
+        assert write_tickets(make_tickets(25), self.path, batch_size=10) == 25
+
+        assert list(read_tickets(self.path, batch_size=7)) == list(make_tickets(25))
+
+    def test_parquet_columns_are_flat(self):
+        import pyarrow.parquet
+
+        write_tickets(make_tickets(3), self.path)
+
+        table = pyarrow.parquet.read_table(self.path)
+        assert "user_email" in table.column_names
+        assert "custom_field_2" in table.column_names
+        assert table.column("tags").to_pylist()[0] == ["a", "tag1"]
+        assert table.column("status").to_pylist() == ["open"] * 3
+        assert table.column("created_at").type.tz == "UTC"
+
+    def test_parquet_custom_field_values_as_text(self):
+        ticket = HelpDeskTicket(
+            id=1,
+            subject="subject",
+            custom_fields=[
+                HelpDeskCustomField(id=3, value=True),
+                HelpDeskCustomField(id=4, value=["a", "b"]),
+            ],
+        )
+        write_tickets([ticket], self.path)
+
+        assert next(read_tickets(self.path)).custom_fields == [
+            HelpDeskCustomField(id=3, value="true"),
+            HelpDeskCustomField(id=4, value='["a", "b"]'),
+        ]
+
+    def test_error_parquet_custom_field_without_column(self):
+        tickets = list(make_tickets(2))
+        tickets[1].custom_fields.append(HelpDeskCustomField(id=9, value="new"))
+
+        with self.assertRaises(HelpDeskException):
+            with ParquetTicketWriter(self.path, batch_size=1) as writer:
+                writer.write_all(tickets)
+
+        with ParquetTicketWriter(
+            self.path, custom_field_ids=[1, 2, 9], batch_size=1
+        ) as writer:
+            writer.write_all(tickets)
+        assert list(read_tickets(self.path))[1].custom_fields[-1].value == "new"
@@ -0,0 +1,60 @@
+import datetime
+import json
+import unittest
+
+from help_desk_client.interfaces import (
+    HelpDeskAttachment,
+    HelpDeskComment,
+    HelpDeskCustomField,
+    HelpDeskTicket,
+    HelpDeskUser,
+    Priority,
+    Status,
+)
+from help_desk_client.ticket_records import ticket_from_record, ticket_to_record
+
+
+class TestTicketRecords(unittest.TestCase):
+    def test_ticket_record_round_trip(self):
+        ticket = HelpDeskTicket(
+            id=12,
+            subject="subject123",
+            user=HelpDeskUser(id=1234, full_name="Jim Example"),
+            tags=["a", "b"],
+            custom_fields=[HelpDeskCustomField(id=1, value=["x", "y"])],
+            created_at=datetime.datetime(
+                2022, 8, 1, 10, 30, tzinfo=datetime.timezone.utc
+            ),
+            status=Status.OPEN,
+            priority=Priority.HIGH,
+            comment=HelpDeskComment(
+                body="comment",
+                attachments=[
+                    HelpDeskAttachment(file_name="notes.txt", id=3, content=b"notes")
+                ],
+            ),
+        )
+
+        record = json.loads(json.dumps(ticket_to_record(ticket)))
+        assert record["status"] == "open"
+        assert record["created_at"] == "2022-08-01T10:30:00+00:00"
+        assert "content" not in record["comment"]["attachments"][0]
+
+        assert ticket_from_record(record) == ticket
+
+    def test_ticket_record_keeps_unknown_values(self):
+        ticket = ticket_from_record(
+            {
+                "id": 1,
+                "subject": "subject123",
+                "status": "hold",
+                "updated_at": "2022-08-01T10:30:15Z",
+                "due_at": "not a date",
+            }
+        )
+
+        assert ticket.status == "hold"
+        assert ticket.updated_at == datetime.datetime(
+            2022, 8, 1, 10, 30, 15, tzinfo=datetime.timezone.utc
+        )
+        assert ticket.due_at == "not a date"
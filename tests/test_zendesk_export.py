@@ -0,0 +1,235 @@
+import datetime
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from help_desk_client.interfaces import HelpDeskException
+from help_desk_client.ticket_records import ticket_from_record, ticket_to_record
+from help_desk_client.zendesk_export import (
+    PARTITION_BY_ID,
+    ExportShard,
+    RateBudget,
+    ZendeskExporter,
+    export_shard,
+    split_range,
+)
+from help_desk_client.zendesk_manager import ZendeskManager
+from tests.test_zendesk_manager import FakeApi, FakeTicket
+
+
+START_TIME = 1659312000  # 2022-08-01T00:00:00Z
+CREDENTIALS = {
+    "email": "test@example.com",  # test email /PS-IGNORE
+    "token": "token123",
+    "subdomain": "subdomain123",
+}
+
+
+def export_tickets() -> list:
+    """Tickets 1 to 60 but every sixth, changed a minute apart."""
+    tickets = []
+    for ticket_id in range(1, 61):
+        if ticket_id % 6 == 0:
+            continue
+        ticket = FakeTicket(ticket_id=ticket_id)
+        ticket.generated_timestamp = START_TIME + ticket_id * 60
+        ticket.updated_at = datetime.datetime.fromtimestamp(
+            ticket.generated_timestamp, datetime.timezone.utc
+        )
+        ticket.tags = ["export", f"ticket-{ticket_id}"]
+        tickets.append(ticket)
+    return tickets
+
+
+class FakeExportManager(ZendeskManager):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.client = FakeApi(tickets=export_tickets())
+
+
+class ChangingExportManager(ZendeskManager):
+    """Ticket 50 changes after the first shard starts, an hour after START_TIME."""
+
+    instances = 0
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        tickets = export_tickets()
+        if ChangingExportManager.instances:
+            ticket = next(ticket for ticket in tickets if ticket.id == 50)
+            ticket.generated_timestamp = START_TIME + 3700
+            ticket.updated_at = datetime.datetime.fromtimestamp(
+                ticket.generated_timestamp, datetime.timezone.utc
+            )
+            ticket.tags = ["export", "changed"]
+        ChangingExportManager.instances += 1
+        self.client = FakeApi(tickets=tickets)
+
+
+class BrokenManager(ZendeskManager):
+    def __init__(self, **kwargs):
+        raise HelpDeskException("Should not be needed")
+
+
+def read_lines(path: str) -> list:
+    with open(path, "rb") as f:
+        return f.readlines()
+
+
+class TestZendeskExporter(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def exporter(self, **kwargs) -> ZendeskExporter:
+        kwargs.setdefault("directory", self.directory.name)
+        kwargs.setdefault("class_path", "tests.test_zendesk_export.FakeExportManager")
+        return ZendeskExporter(credentials=CREDENTIALS, **kwargs)
+
+    def test_split_range(self):
+        assert split_range(0, 10, 3, PARTITION_BY_ID) == [
+            ExportShard(index=0, start=0, end=3, partition_by=PARTITION_BY_ID),
+            ExportShard(index=1, start=3, end=6, partition_by=PARTITION_BY_ID),
+            ExportShard(index=2, start=6, end=10, partition_by=PARTITION_BY_ID),
+        ]
+        assert len(split_range(0, 2, 8, PARTITION_BY_ID)) == 2
+
+    def test_export_time_range_matches_get_ticket(self):
+        output = self.exporter(workers=1, checkpoint_every=7).export_time_range(
+            START_TIME, START_TIME + 3600, shards=4
+        )
+
+        lines = read_lines(output)
+        ids = [json.loads(line)["id"] for line in lines]
+        assert ids == [i for i in range(1, 60) if i % 6 != 0]
+
+        manager = FakeExportManager(credentials=CREDENTIALS)
+        for line in lines:
+            record = json.loads(line)
+            assert record == ticket_to_record(manager.get_ticket(record["id"]))
+            assert ticket_from_record(record).updated_at is not None
+
+    @mock.patch("help_desk_client.zendesk_export.time.time")
+    def test_export_time_range_catches_up_with_changed_tickets(self, mock_time):
+        mock_time.return_value = START_TIME + 3600
+        ChangingExportManager.instances = 0
+
+        output = self.exporter(
+            workers=1, class_path="tests.test_zendesk_export.ChangingExportManager"
+        ).export_time_range(START_TIME, shards=4)
+
+        records = {
+            record["id"]: record for record in map(json.loads, read_lines(output))
+        }
+        assert len(records) == 50
+        assert records[50]["tags"] == ["export", "changed"]
+
+    def test_export_id_range_across_processes_is_deterministic(self):
+        by_time = self.exporter(
+            directory=os.path.join(self.directory.name, "time"), workers=1
+        ).export_time_range(START_TIME, START_TIME + 3700, shards=3)
+        by_id = self.exporter(
+            directory=os.path.join(self.directory.name, "id"),
+            workers=2,
+            checkpoint_every=4,
+        ).export_id_range(1, 60, shards=5)
+
+        assert read_lines(by_id) == read_lines(by_time)
+        assert len(read_lines(by_id)) == 50
+
+    def test_export_skips_finished_shards(self):
+        self.exporter(workers=1).export_id_range(1, 60, shards=3)
+        expected = read_lines(os.path.join(self.directory.name, "tickets.ndjson"))
+
+        output = self.exporter(
+            workers=1, class_path="tests.test_zendesk_export.BrokenManager"
+        ).export_id_range(1, 60, shards=3)
+        assert read_lines(output) == expected
+
+    def test_export_shard_resumes_from_checkpoint(self):
+        shard = ExportShard(index=0, start=START_TIME, end=START_TIME + 3700)
+        class_path = "tests.test_zendesk_export.FakeExportManager"
+        kwargs = {"credentials": CREDENTIALS}
+        assert export_shard(shard, self.directory.name, class_path, kwargs) == 50
+
+        path = os.path.join(self.directory.name, "shard-0000.ndjson")
+        expected = read_lines(path)
+        with open(path, "ab") as f:
+            f.write(b"partly written")
+        with open(path + ".checkpoint.json", "w") as f:
+            json.dump(
+                {
+                    "shard": {
+                        "index": 0,
+                        "start": START_TIME,
+                        "end": START_TIME + 3700,
+                        "partition_by": "time",
+                    },
+                    "position": START_TIME + 3 * 60,
+                    "offset": len(b"".join(expected[:3])),
+                    "count": 3,
+                    "done": False,
+                },
+                f,
+            )
+
+        assert export_shard(shard, self.directory.name, class_path, kwargs) == 50
+        assert read_lines(path) == expected
+
+    def test_error_export_shard_checkpoint_for_other_shard(self):
+        class_path = "tests.test_zendesk_export.FakeExportManager"
+        kwargs = {"credentials": CREDENTIALS}
+        export_shard(
+            ExportShard(index=0, start=1, end=10, partition_by=PARTITION_BY_ID),
+            self.directory.name,
+            class_path,
+            kwargs,
+        )
+
+        with self.assertRaises(HelpDeskException):
+            export_shard(
+                ExportShard(index=0, start=1, end=20, partition_by=PARTITION_BY_ID),
+                self.directory.name,
+                class_path,
+                kwargs,
+            )
+
+    def test_merge_keeps_latest_version(self):
+        shards = [
+            ExportShard(index=0, start=0, end=10),
+            ExportShard(index=1, start=10, end=20),
+        ]
+        versions = [
+            [
+                {"id": 1, "subject": "old", "updated_at": "2022-08-01T10:00:00+00:00"},
+                {"id": 2, "subject": "only", "updated_at": "2022-08-01T10:00:00Z"},
+            ],
+            [{"id": 1, "subject": "new", "updated_at": "2022-08-01T11:00:00+00:00"}],
+        ]
+        for shard, records in zip(shards, versions):
+            with open(
+                os.path.join(self.directory.name, f"{shard.name}.ndjson"), "w"
+            ) as f:
+                f.writelines(json.dumps(record) + "\n" for record in records)
+
+        output = os.path.join(self.directory.name, "merged.ndjson")
+        assert self.exporter().merge(shards, output) == 2
+        assert [json.loads(line)["subject"] for line in read_lines(output)] == [
+            "new",
+            "only",
+        ]
+
+
+class TestRateBudget(unittest.TestCase):
+    def test_rate_budget_spreads_requests(self):
+        budget = RateBudget(requests_per_minute=600)
+
+        started = time.monotonic()
+        for _ in range(15):
+            budget.acquire()
+
+        # Ten requests are allowed straight away, then ten a second.
+        assert 0.4 <= time.monotonic() - started < 2
@@ -0,0 +1,114 @@
+import asyncio
+import subprocess
+import sys
+import time
+import unittest
+
+from help_desk_client.interfaces import HelpDeskException, HelpDeskTicket
+from help_desk_client.zendesk_jobs import JobResult, ZendeskJobTracker
+from tests.test_zendesk_manager import FakeApi, FakeJobStatus
+
+
+class TestZendeskJobTracker(unittest.TestCase):
+    def setUp(self):
+        self.client = FakeApi()
+        self.tracker = ZendeskJobTracker(
+            lambda: self.client, timeout=5, min_interval=0.01, max_interval=0.05
+        )
+
+    def queue_job(self, job_id: str) -> FakeJobStatus:
+        job_status = FakeJobStatus(job_id=job_id, status="queued")
+        self.client._jobs[job_id] = job_status
+        return job_status
+
+    def test_track_many_jobs_in_one_poll(self):
+        futures = [self.tracker.track(self.queue_job(f"job{i}")) for i in range(150)]
+        for i in range(150):
+            self.client._jobs[f"job{i}"] = FakeJobStatus(
+                job_id=f"job{i}", status="completed", results=[{"id": i}]
+            )
+
+        assert [future.result(timeout=5)[0].id for future in futures] == list(
+            range(150)
+        )
+        # Two show_many calls of up to 100 jobs for each poll.
+        assert self.client.calls.count("job_status") <= 4
+        assert self.tracker.pending() == 0
+
+    def test_results_map_back_to_items(self):
+        tickets = [HelpDeskTicket(id=i, subject=f"subject{i}") for i in (1, 2, 3)]
+        future = self.tracker.track(self.queue_job("job1"), tickets)
+        self.client._jobs["job1"] = FakeJobStatus(
+            job_id="job1",
+            status="completed",
+            results=[
+                {"index": 2, "id": 3, "status": "Updated", "success": True},
+                {"index": 0, "error": "TicketUpdateFailed", "details": "Locked"},
+                {"index": 1, "id": 2, "status": "Updated"},
+            ],
+        )
+
+        results = future.result(timeout=5)
+        assert [(result.item.id, result.success) for result in results] == [
+            (3, True),
+            (1, False),
+            (2, True),
+        ]
+        assert results[1].error == "Locked"
+        assert results[1].get("error") == "TicketUpdateFailed"
+        assert results[1].get("missing") is None
+
+    def test_finished_job_needs_no_poll(self):
+        job_status = FakeJobStatus(job_id="job1", status="completed", results=[{}])
+
+        assert self.tracker.track(job_status, ["item"]).result() == [
+            JobResult(item="item", raw={})
+        ]
+        assert self.client.calls == []
+
+    def test_error_job_failed(self):
+        future = self.tracker.track(self.queue_job("job1"))
+        self.client._jobs["job1"] = FakeJobStatus(job_id="job1", status="failed")
+
+        with self.assertRaises(HelpDeskException):
+            future.result(timeout=5)
+
+    def test_error_job_timeout(self):
+        future = self.tracker.track(self.queue_job("job1"), timeout=0.05)
+
+        with self.assertRaises(HelpDeskException):
+            future.result(timeout=5)
+        assert self.tracker.pending() == 0
+
+    def test_polls_back_off_without_progress(self):
+        self.tracker.track(self.queue_job("job1"), timeout=0.3)
+
+        time.sleep(0.35)
+        # Polling every 0.01 seconds would take 30 calls.
+        assert self.client.calls.count("job_status") < 15
+
+    def test_wait_from_asyncio(self):
+        async def wait():
+            waiting = self.tracker.wait(self.queue_job("job1"), ["item"])
+            self.client._jobs["job1"] = FakeJobStatus(
+                job_id="job1", status="completed", results=[{"id": 7}]
+            )
+            return await waiting
+
+        results = asyncio.run(wait())
+        assert (results[0].item, results[0].id) == ("item", 7)
+
+    def test_import_does_not_load_asyncio(self):
+        result = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "import sys, help_desk_client.zendesk_manager; "
+                "print('asyncio' in sys.modules)",
+            ],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+
+        assert result.stdout.strip() == "False"
@@ -1,22 +1,32 @@
 import datetime
+import io
+import mmap
+import tempfile
+import time
 import unittest
+from unittest import mock
 
+import requests
+from requests.adapters import BaseAdapter
 from zenpy.lib import exception
 from zenpy.lib.api_objects import Ticket
 from zenpy.lib.api_objects import User as ZendeskUser
 
 from help_desk_client.interfaces import (
+    HelpDeskAttachment,
     HelpDeskComment,
     HelpDeskCustomField,
     HelpDeskException,
     HelpDeskTicket,
+    HelpDeskTicketConflictException,
     HelpDeskTicketNotFoundException,
+    HelpDeskUnavailableException,
     HelpDeskUser,
     Priority,
     Status,
     TicketType,
 )
-from help_desk_client.zendesk_manager import ZendeskManager
+from help_desk_client.zendesk_manager import UploadStream, ZendeskManager
 
 
 class FakeUser(object):
@@ -41,6 +51,63 @@ class FakeTicket(object):
         self.requester = requester
 
 
+class FakeConflictResponse(object):
+    status_code = 409
+
+
+class FakeAttachment(object):
+    def __init__(self, attachment_id, file_name):
+        self.id = attachment_id
+        self.file_name = file_name
+        self.content_url = f"https://example.com/{file_name}"
+        self.content_type = "text/plain"
+        self.size = 42
+
+
+class FakeComment(object):
+    def __init__(self, comment_id, author_id, attachments=None):
+        self.id = comment_id
+        self.body = f"comment {comment_id}"
+        self.author_id = author_id
+        self.public = True
+        self.created_at = "2022-08-01T10:30:15Z"
+        self.attachments = attachments or []
+
+
+class FlakyTickets(object):
+    """Ticket lookups that fail, are slow or go through a session."""
+
+    def __init__(self, failures=0, delays=(), session=None):
+        self.failures = failures
+        self.delays = list(delays)
+        self.session = session
+        self.calls = 0
+
+    def __call__(self, id: int) -> FakeTicket:
+        self.calls += 1
+        if self.failures > 0:
+            self.failures -= 1
+            raise requests.exceptions.ConnectionError()
+        if self.delays:
+            time.sleep(self.delays.pop(0))
+        if self.session is not None:
+            self.session.get(f"https://subdomain123.zendesk.com/{id}", timeout=5)
+        return FakeTicket(ticket_id=id)
+
+
+class FakeUpload(object):
+    def __init__(self, token, attachment):
+        self.token = token
+        self.attachment = attachment
+
+
+class FakeJobStatus(object):
+    def __init__(self, job_id, status, results=None):
+        self.id = job_id
+        self.status = status
+        self.results = results
+
+
 class FakeTicketAudit(object):
     def __init__(self, ticket):
         self.ticket = ticket
@@ -56,6 +123,17 @@ class FakeApi(object):
             self.parent = parent
 
         def create_or_update(self, zendesk_user: ZendeskUser) -> ZendeskUser:
+            if isinstance(zendesk_user, list):
+                self.parent.calls.append("create_or_update_many")
+                results = [
+                    {
+                        "index": index,
+                        "id": self.create_or_update(user).id,
+                        "email": user.email,
+                    }
+                    for index, user in enumerate(zendesk_user)
+                ]
+                return FakeJobStatus(job_id="job1", status="queued", results=results)
             if zendesk_user.id:
                 userid = zendesk_user.id
             else:
@@ -67,8 +145,12 @@ class FakeApi(object):
         def me(self):
             return self._me
 
-        def __call__(self, id: int) -> ZendeskUser:
+        def __call__(self, id: int = None, ids: list = None) -> ZendeskUser:
             """Recover a specific user."""
+            if ids is not None:
+                self.parent.calls.append("show_many")
+                return [self.parent._users[i] for i in ids if i in self.parent._users]
+            self.parent.calls.append("show")
             user = self.parent._users.get(id, None)
             if user:
                 return user
@@ -83,10 +165,17 @@ class FakeApi(object):
 
         def update(self, ticket):
             """No actual update performed"""
+            self.parent.updates.append(ticket)
+            if self.parent.conflicts > 0:
+                self.parent.conflicts -= 1
+                raise exception.APIException(
+                    '{"error": "UpdateConflict"}', response=FakeConflictResponse()
+                )
             tickettoupdate = self.parent._tickets.get(ticket.id, None)
             if tickettoupdate:
-                self.parent._tickets[ticket.id] = ticket
-                return FakeTicketAudit(ticket)
+                for key in ticket._dirty_attributes:
+                    setattr(tickettoupdate, key, getattr(ticket, key))
+                return FakeTicketAudit(tickettoupdate)
             else:
                 return None
 
@@ -100,26 +189,87 @@ class FakeApi(object):
             self._next_ticket_id += 1
             return FakeTicketAudit(ticket)
 
-        def __call__(self, id: int) -> Ticket:
-            """Recover a specific ticket."""
+        def comments(self, ticket_id: int) -> list:
+            """Recover the comments on a ticket."""
+            self.parent.calls.append("comments")
+            if ticket_id not in self.parent._tickets:
+                raise exception.RecordNotFoundException
+            return iter(self.parent._comments.get(ticket_id, []))
+
+        def incremental(self, start_time: int, include=None) -> list:
+            """Export the tickets changed since start_time, oldest first."""
+            self.parent.calls.append("incremental")
+            return sorted(
+                (
+                    ticket
+                    for ticket in self.parent._tickets.values()
+                    if ticket.generated_timestamp >= start_time
+                ),
+                key=lambda ticket: ticket.generated_timestamp,
+            )
+
+        def __call__(self, id: int = None, ids: list = None, include=None) -> Ticket:
+            """Recover a specific ticket, or the tickets that exist of many."""
+            if ids is not None:
+                self.parent.calls.append("show_many")
+                return [
+                    self.parent._tickets[i] for i in ids if i in self.parent._tickets
+                ]
             ticket = self.parent._tickets.get(id, None)
             if ticket:
                 return ticket
             else:
                 raise exception.RecordNotFoundException
 
-    def __init__(self, tickets=[], me=None, ticket_audit=None, users=[]):
+    def __init__(
+        self, tickets=[], me=None, ticket_audit=None, users=[], conflicts=0, comments={}
+    ):
         self.results = tickets
+        self._comments: dict[int, list[FakeComment]] = comments
+        self.conflicts = conflicts
+        self.updates: list[Ticket] = []
+        self.calls: list[str] = []
+        self._jobs: dict[str, FakeJobStatus] = {}
         self._users: dict[int, FakeUser] = dict([(user.id, user) for user in users])
         self.users = self.FakeUsers(self, me=me)
         self._tickets: dict[int, FakeTicket] = dict(
             [(ticket.id, ticket) for ticket in tickets]
         )
         self.tickets = self.FakeTicketCRUD(self, ticket_audit)
+        self.attachments = self.FakeAttachments(self)
 
         for ticket in tickets:
             self._tickets[ticket.id] = ticket
 
+    class FakeAttachments(object):
+        def __init__(self, parent):
+            self.parent = parent
+            self.uploaded = {}
+
+        def upload(self, fp, token=None, target_name=None, content_type=None):
+            """Read the upload the way requests would and keep the content."""
+            if isinstance(fp, bytes):
+                content = fp
+            else:
+                length = len(fp)
+                content = b"".join(iter(lambda: fp.read(4), b""))
+                assert len(content) == length
+            self.uploaded[target_name] = (content, token)
+            attachment_id = len(self.uploaded)
+            return FakeUpload(
+                token=token or f"token{attachment_id}",
+                attachment=FakeAttachment(attachment_id, target_name),
+            )
+
+    def job_status(self, id: str = None, ids: list = None) -> FakeJobStatus:
+        self.calls.append("job_status")
+        if ids is not None:
+            return [self.job_status_for(i) for i in ids]
+        return self.job_status_for(id)
+
+    def job_status_for(self, id: str) -> FakeJobStatus:
+        return self._jobs.get(id, FakeJobStatus(job_id=id, status="completed"))
+
     def search(self, chat_id, type):
         return self.results
 
@@ -531,3 +681,757 @@ class TestZenDesk(unittest.TestCase):
 
         with self.assertRaises(HelpDeskTicketNotFoundException):
             zendesk_manager.close_ticket(ticket_id=54321)
+
+    def test_zendesk_safe_update_sends_updated_stamp(self):
+        zendesk_manager = ZendeskManager(
+            credentials={
+                "email": "test@example.com",  # test email /PS-IGNORE
+                "token": "token123",
+                "subdomain": "subdomain123",
+            },
+            safe_update=True,
+        )
+
+        fake_user = FakeUser(
+            id=1234,
+            name="Jim Example",
+            email="test@example.com",  # test email /PS-IGNORE
+        )
+        fake_ticket = FakeTicket(ticket_id=12345)
+        zendesk_manager.client = FakeApi(tickets=[fake_ticket], users=[fake_user])
+
+        ticket = HelpDeskTicket(
+            subject="subject123",
+            user=HelpDeskUser(id=1234),
+            id=12345,
+            updated_at=datetime.datetime(2022, 8, 1, 10, 30, 15),
+        )
+        zendesk_manager.update_ticket(ticket=ticket)
+
+        sent = zendesk_manager.client.updates[0]
+        assert sent.safe_update is True
+        assert sent.updated_stamp == "2022-08-01T10:30:15Z"
+
+    def test_error_zendesk_safe_update_without_updated_at(self):
+        zendesk_manager = ZendeskManager(
+            credentials={
+                "email": "test@example.com",  # test email /PS-IGNORE
+                "token": "token123",
+                "subdomain": "subdomain123",
+            },
+        )
+
+        fake_user = FakeUser(
+            id=1234,
+            name="Jim Example",
+            email="test@example.com",  # test email /PS-IGNORE
+        )
+        fake_ticket = FakeTicket(ticket_id=12345)
+        zendesk_manager.client = FakeApi(tickets=[fake_ticket], users=[fake_user])
+
+        ticket = HelpDeskTicket(
+            subject="subject123", user=HelpDeskUser(id=1234), id=12345
+        )
+
+        with self.assertRaises(HelpDeskException):
+            zendesk_manager.update_ticket(ticket=ticket, safe_update=True)
+
+    def test_error_zendesk_update_ticket_conflict(self):
+        zendesk_manager = ZendeskManager(
+            credentials={
+                "email": "test@example.com",  # test email /PS-IGNORE
+                "token": "token123",
+                "subdomain": "subdomain123",
+            },
+            safe_update=True,
+        )
+
+        fake_user = FakeUser(
+            id=1234,
+            name="Jim Example",
+            email="test@example.com",  # test email /PS-IGNORE
+        )
+        fake_ticket = FakeTicket(ticket_id=12345)
+        zendesk_manager.client = FakeApi(
+            tickets=[fake_ticket], users=[fake_user], conflicts=1
+        )
+
+        ticket = HelpDeskTicket(
+            subject="subject123",
+            user=HelpDeskUser(id=1234),
+            id=12345,
+            updated_at="2022-08-01T10:30:15Z",
+        )
+
+        with self.assertRaises(HelpDeskTicketConflictException):
+            zendesk_manager.update_ticket(ticket=ticket)
+
+    def test_zendesk_update_ticket_conflict_retry(self):
+        zendesk_manager = ZendeskManager(
+            credentials={
+                "email": "test@example.com",  # test email /PS-IGNORE
+                "token": "token123",
+                "subdomain": "subdomain123",
+            },
+            safe_update=True,
+            conflict_retries=2,
+        )
+
+        fake_user = FakeUser(
+            id=1234,
+            name="Jim Example",
+            email="test@example.com",  # test email /PS-IGNORE
+        )
+        fake_ticket = FakeTicket(ticket_id=12345)
+        fake_ticket.tags = ["server-tag"]
+        fake_ticket.updated_at = "2022-08-01T11:00:00Z"
+        zendesk_manager.client = FakeApi(
+            tickets=[fake_ticket], users=[fake_user], conflicts=2
+        )
+
+        ticket = HelpDeskTicket(
+            subject="subject123",
+            user=HelpDeskUser(id=1234),
+            id=12345,
+            tags=["local-tag"],
+            updated_at="2022-08-01T10:30:15Z",
+        )
+        updatedticket = zendesk_manager.update_ticket(ticket=ticket)
+
+        assert len(zendesk_manager.client.updates) == 3
+        assert zendesk_manager.client.updates[-1].updated_stamp == (
+            "2022-08-01T11:00:00Z"
+        )
+        assert updatedticket.tags == ["local-tag", "server-tag"]
+
+    def test_zendesk_update_ticket_sends_only_changed_fields(self):
+        zendesk_manager = ZendeskManager(
+            credentials={
+                "email": "test@example.com",  # test email /PS-IGNORE
+                "token": "token123",
+                "subdomain": "subdomain123",
+            },
+        )
+
+        fake_user = FakeUser(
+            id=1234,
+            name="Jim Example",
+            email="test@example.com",  # test email /PS-IGNORE
+        )
+        fake_ticket = FakeTicket(ticket_id=12345, requester=fake_user)
+        fake_ticket.custom_fields = [
+            {"id": 1, "value": "first"},
+            {"id": 2, "value": "second"},
+        ]
+        zendesk_manager.client = FakeApi(tickets=[fake_ticket], users=[fake_user])
+
+        ticket = zendesk_manager.get_ticket(ticket_id=12345)
+        ticket.status = "pending"
+        ticket.custom_fields[1] = HelpDeskCustomField(id=2, value="changed")
+        updatedticket = zendesk_manager.update_ticket(ticket=ticket)
+
+        sent = zendesk_manager.client.updates[0].to_dict(serialize=True)
+        assert sent == {
+            "id": 12345,
+            "status": "pending",
+            "custom_fields": [{"id": 2, "value": "changed"}],
+        }
+        assert updatedticket.subject == "fakesubject"
+        assert updatedticket.status == "pending"
+
+    def test_zendesk_update_ticket_without_changes_is_not_sent(self):
+        zendesk_manager = ZendeskManager(
+            credentials={
+                "email": "test@example.com",  # test email /PS-IGNORE
+                "token": "token123",
+                "subdomain": "subdomain123",
+            },
+        )
+
+        fake_ticket = FakeTicket(ticket_id=12345)
+        zendesk_manager.client = FakeApi(tickets=[fake_ticket])
+
+        ticket = zendesk_manager.get_ticket(ticket_id=12345)
+        updatedticket = zendesk_manager.update_ticket(ticket=ticket)
+
+        assert zendesk_manager.client.updates == []
+        assert updatedticket == ticket
+
+    def test_zendesk_update_ticket_conflict_keeps_server_changes(self):
+        zendesk_manager = ZendeskManager(
+            credentials={
+                "email": "test@example.com",  # test email /PS-IGNORE
+                "token": "token123",
+                "subdomain": "subdomain123",
+            },
+            safe_update=True,
+            conflict_retries=1,
+        )
+
+        fake_ticket = FakeTicket(ticket_id=12345)
+        fake_ticket.updated_at = "2022-08-01T10:30:15Z"
+        zendesk_manager.client = FakeApi(tickets=[fake_ticket], conflicts=1)
+
+        ticket = zendesk_manager.get_ticket(ticket_id=12345)
+        ticket.status = "pending"
+
+        # Someone else changes the subject before our update lands.
+        fake_ticket.subject = "changed on the server"
+        fake_ticket.updated_at = "2022-08-01T11:00:00Z"
+
+        updatedticket = zendesk_manager.update_ticket(ticket=ticket)
+
+        sent = zendesk_manager.client.updates[-1].to_dict(serialize=True)
+        assert sent["status"] == "pending"
+        assert "subject" not in sent
+        assert sent["updated_stamp"] == "2022-08-01T11:00:00Z"
+        assert updatedticket.subject == "changed on the server"
+
+    def test_zendesk_update_ticket_compares_with_version_edited(self):
+        zendesk_manager = ZendeskManager(
+            credentials={
+                "email": "test@example.com",  # test email /PS-IGNORE
+                "token": "token123",
+                "subdomain": "subdomain123",
+            },
+            safe_update=True,
+            conflict_retries=1,
+        )
+
+        fake_ticket = FakeTicket(ticket_id=12345)
+        fake_ticket.subject = "a"
+        fake_ticket.updated_at = "2022-08-01T10:30:15Z"
+        zendesk_manager.client = FakeApi(tickets=[fake_ticket], conflicts=1)
+
+        ticket = zendesk_manager.get_ticket(ticket_id=12345)
+
+        # Another agent changes the subject, then another caller sharing the
+        # manager reads the ticket.
+        fake_ticket.subject = "b"
+        fake_ticket.updated_at = "2022-08-01T11:00:00Z"
+        zendesk_manager.get_ticket(ticket_id=12345)
+
+        ticket.status = "pending"
+        updatedticket = zendesk_manager.update_ticket(ticket=ticket)
+
+        for update in zendesk_manager.client.updates:
+            assert "subject" not in update.to_dict(serialize=True)
+        assert updatedticket.subject == "b"
+        assert updatedticket.status == "pending"
+
+    def test_zendesk_update_ticket_conflict_keeps_removed_tags_removed(self):
+        zendesk_manager = ZendeskManager(
+            credentials={
+                "email": "test@example.com",  # test email /PS-IGNORE
+                "token": "token123",
+                "subdomain": "subdomain123",
+            },
+            safe_update=True,
+            conflict_retries=1,
+        )
+
+        fake_ticket = FakeTicket(ticket_id=12345)
+        fake_ticket.tags = ["keep", "remove"]
+        fake_ticket.updated_at = "2022-08-01T10:30:15Z"
+        zendesk_manager.client = FakeApi(tickets=[fake_ticket], conflicts=1)
+
+        ticket = zendesk_manager.get_ticket(ticket_id=12345)
+        ticket.tags = ["keep"]
+
+        fake_ticket.subject = "changed on the server"
+        fake_ticket.updated_at = "2022-08-01T11:00:00Z"
+
+        updatedticket = zendesk_manager.update_ticket(ticket=ticket)
+
+        sent = zendesk_manager.client.updates[-1].to_dict(serialize=True)
+        assert sent["tags"] == ["keep"]
+        assert updatedticket.tags == ["keep"]
+        assert updatedticket.subject == "changed on the server"
+
+    def test_zendesk_update_ticket_conflict_refetches_cached_ticket(self):
+        zendesk_manager = ZendeskManager(
+            credentials={
+                "email": "test@example.com",  # test email /PS-IGNORE
+                "token": "token123",
+                "subdomain": "subdomain123",
+            },
+            safe_update=True,
+            conflict_retries=1,
+            cached_reads=True,
+        )
+
+        fake_ticket = FakeTicket(ticket_id=12345)
+        fake_ticket.updated_at = "2022-08-01T10:30:15Z"
+        zendesk_manager.client = FakeApi(tickets=[fake_ticket], conflicts=1)
+
+        ticket = zendesk_manager.get_ticket(ticket_id=12345)
+        ticket.status = "pending"
+        fake_ticket.updated_at = "2022-08-01T11:00:00Z"
+
+        zendesk_manager.update_ticket(ticket=ticket)
+
+        sent = zendesk_manager.client.updates[-1].to_dict(serialize=True)
+        assert sent["updated_stamp"] == "2022-08-01T11:00:00Z"
+
+    def test_zendesk_get_or_create_users(self):
+        zendesk_manager = ZendeskManager(
+            credentials={
+                "email": "test@example.com",  # test email /PS-IGNORE
+                "token": "token123",
+                "subdomain": "subdomain123",
+            },
+        )
+        fake_users = [
+            FakeUser(
+                id=1234,
+                name="Jim Example",
+                email="jim@example.com",  # test email /PS-IGNORE
+            ),
+            FakeUser(
+                id=5678,
+                name="Jo Example",
+                email="jo@example.com",  # test email /PS-IGNORE
+            ),
+        ]
+        zendesk_manager.client = FakeApi(users=fake_users)
+        zendesk_manager.client.users._next_userid = 10
+        zendesk_manager.client._jobs["job1"] = FakeJobStatus(
+            job_id="job1",
+            status="completed",
+            results=[{"id": 10, "email": "new@example.com"}],  # /PS-IGNORE
+        )
+
+        help_desk_users = zendesk_manager.get_or_create_users(
+            [
+                HelpDeskUser(id=1234),
+                HelpDeskUser(full_name="New", email="new@example.com"),  # /PS-IGNORE
+                HelpDeskUser(id=5678),
+                HelpDeskUser(full_name="New", email="NEW@example.com"),  # /PS-IGNORE
+                HelpDeskUser(id=1234),
+            ]
+        )
+
+        assert [user.id for user in help_desk_users] == [1234, 10, 5678, 10, 1234]
+        assert help_desk_users[0].full_name == "Jim Example"
+        assert help_desk_users[1].full_name == "New"
+        assert zendesk_manager.client.calls == [
+            "show_many",
+            "create_or_update_many",
+            "job_status",
+        ]
+
+    def test_zendesk_get_or_create_users_matches_results_by_index(self):
+        zendesk_manager = ZendeskManager(
+            credentials={
+                "email": "test@example.com",  # test email /PS-IGNORE
+                "token": "token123",
+                "subdomain": "subdomain123",
+            },
+        )
+        zendesk_manager.client = FakeApi()
+        # Results that leave out the email, in a different order to the users.
+        zendesk_manager.client._jobs["job1"] = FakeJobStatus(
+            job_id="job1",
+            status="completed",
+            results=[{"index": 1, "id": 11}, {"index": 0, "id": 10}],
+        )
+
+        help_desk_users = zendesk_manager.get_or_create_users(
+            [
+                HelpDeskUser(full_name="One", email="one@example.com"),  # /PS-IGNORE
+                HelpDeskUser(full_name="Two", email="Two@example.com"),  # /PS-IGNORE
+            ]
+        )
+
+        assert [(user.id, user.full_name) for user in help_desk_users] == [
+            (10, "One"),
+            (11, "Two"),
+        ]
+        assert help_desk_users[1].email == "Two@example.com"  # /PS-IGNORE
+
+    def test_zendesk_get_or_create_users_uses_user_cache(self):
+        zendesk_manager = ZendeskManager(
+            credentials={
+                "email": "test@example.com",  # test email /PS-IGNORE
+                "token": "token123",
+                "subdomain": "subdomain123",
+            },
+        )
+        fake_user = FakeUser(
+            id=1234,
+            name="Jim Example",
+            email="test@example.com",  # test email /PS-IGNORE
+        )
+        zendesk_manager.client = FakeApi(users=[fake_user])
+
+        zendesk_manager.get_or_create_users([HelpDeskUser(id=1234)])
+        help_desk_user = zendesk_manager.get_or_create_user(HelpDeskUser(id=1234))
+
+        assert help_desk_user.full_name == "Jim Example"
+        assert zendesk_manager.client.calls == ["show_many"]
+
+    def test_error_zendesk_get_or_create_users_not_found(self):
+        zendesk_manager = ZendeskManager(
+            credentials={
+                "email": "test@example.com",  # test email /PS-IGNORE
+                "token": "token123",
+                "subdomain": "subdomain123",
+            },
+        )
+        zendesk_manager.client = FakeApi()
+
+        with self.assertRaises(HelpDeskException):
+            zendesk_manager.get_or_create_users([HelpDeskUser(id=1234)])
+
+    def test_zendesk_iter_comments(self):
+        zendesk_manager = ZendeskManager(
+            credentials={
+                "email": "test@example.com",  # test email /PS-IGNORE
+                "token": "token123",
+                "subdomain": "subdomain123",
+            },
+        )
+        fake_ticket = FakeTicket(ticket_id=12345)
+        zendesk_manager.client = FakeApi(
+            tickets=[fake_ticket],
+            comments={
+                12345: [
+                    FakeComment(1, author_id=1234),
+                    FakeComment(
+                        2, author_id=5678, attachments=[FakeAttachment(9, "log.txt")]
+                    ),
+                ]
+            },
+        )
+
+        comments = zendesk_manager.iter_comments(ticket_id=12345)
+        assert zendesk_manager.client.calls == []
+
+        comments = list(comments)
+        assert [comment.id for comment in comments] == [1, 2]
+        assert comments[0].body == "comment 1"
+        assert comments[0].created_at == "2022-08-01T10:30:15Z"
+        assert comments[0].attachments is None
+        assert comments[1].attachments == [
+            HelpDeskAttachment(
+                id=9,
+                file_name="log.txt",
+                content_url="https://example.com/log.txt",
+                content_type="text/plain",
+                size=42,
+            )
+        ]
+
+    def test_zendesk_iter_comments_for_tickets_include_authors(self):
+        zendesk_manager = ZendeskManager(
+            credentials={
+                "email": "test@example.com",  # test email /PS-IGNORE
+                "token": "token123",
+                "subdomain": "subdomain123",
+            },
+        )
+        fake_users = [
+            FakeUser(
+                id=1234,
+                name="Jim Example",
+                email="jim@example.com",  # test email /PS-IGNORE
+            ),
+            FakeUser(
+                id=5678,
+                name="Jo Example",
+                email="jo@example.com",  # test email /PS-IGNORE
+            ),
+        ]
+        zendesk_manager.client = FakeApi(
+            tickets=[FakeTicket(ticket_id=1), FakeTicket(ticket_id=2)],
+            users=fake_users,
+            comments={
+                1: [FakeComment(11, author_id=1234)],
+                2: [FakeComment(21, author_id=5678), FakeComment(22, author_id=1234)],
+            },
+        )
+
+        comments = list(
+            zendesk_manager.iter_comments_for_tickets([1, 2], include_authors=True)
+        )
+        assert [(ticket_id, comment.id) for ticket_id, comment in comments] == [
+            (1, 11),
+            (2, 21),
+            (2, 22),
+        ]
+
+        help_desk_user = zendesk_manager.get_or_create_user(HelpDeskUser(id=5678))
+        assert help_desk_user.full_name == "Jo Example"
+        assert zendesk_manager.client.calls == ["comments", "comments", "show_many"]
+
+    def test_error_zendesk_iter_comments_not_found(self):
+        zendesk_manager = ZendeskManager(
+            credentials={
+                "email": "test@example.com",  # test email /PS-IGNORE
+                "token": "token123",
+                "subdomain": "subdomain123",
+            },
+        )
+        zendesk_manager.client = FakeApi(tickets=[FakeTicket(ticket_id=12345)])
+
+        with self.assertRaises(HelpDeskTicketNotFoundException):
+            list(zendesk_manager.iter_comments(ticket_id=54321))
+
+    def test_zendesk_upload_attachment_streams_file(self):
+        zendesk_manager = ZendeskManager(
+            credentials={
+                "email": "test@example.com",  # test email /PS-IGNORE
+                "token": "token123",
+                "subdomain": "subdomain123",
+            },
+        )
+        zendesk_manager.client = FakeApi()
+
+        fp = io.BytesIO(b"header:log line one\nlog line two\n")
+        fp.seek(len(b"header:"))
+        attachment = HelpDeskAttachment(file_name="app.log", content=fp)
+
+        token = zendesk_manager.upload_attachment(attachment)
+
+        assert token == "token1"
+        assert attachment.id == 1
+        assert attachment.content_url == "https://example.com/app.log"
+        assert zendesk_manager.client.attachments.uploaded["app.log"] == (
+            b"log line one\nlog line two\n",
+            None,
+        )
+        assert not fp.closed
+
+    def test_zendesk_add_comment_with_attachments(self):
+        zendesk_manager = ZendeskManager(
+            credentials={
+                "email": "test@example.com",  # test email /PS-IGNORE
+                "token": "token123",
+                "subdomain": "subdomain123",
+            },
+        )
+        fake_user = FakeUser(
+            id=1234, name="fakename", email="fake@email.com"  # test email /PS-IGNORE
+        )
+        fake_ticket = FakeTicket(ticket_id=12345, requester=fake_user)
+        zendesk_manager.client = FakeApi(tickets=[fake_ticket], users=[fake_user])
+
+        with tempfile.NamedTemporaryFile() as log_file, tempfile.TemporaryFile() as f:
+            log_file.write(b"first file")
+            log_file.flush()
+            f.write(b"second file")
+            f.flush()
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                comment = HelpDeskComment(
+                    body="logs attached",
+                    attachments=[
+                        HelpDeskAttachment(file_name="one.log", content=log_file.name),
+                        HelpDeskAttachment(file_name="two.log", content=mapped),
+                        HelpDeskAttachment(file_name="three.txt", content=b"third"),
+                    ],
+                )
+                zendesk_manager.add_comment(ticket_id=12345, comment=comment)
+
+        uploaded = zendesk_manager.client.attachments.uploaded
+        assert uploaded == {
+            "one.log": (b"first file", None),
+            "two.log": (b"second file", "token1"),
+            "three.txt": (b"third", "token1"),
+        }
+        sent = zendesk_manager.client.updates[0]
+        assert sent.comment.uploads == ["token1"]
+        assert sorted(a.id for a in comment.attachments) == [1, 2, 3]
+
+    def test_upload_stream_length_from_current_position(self):
+        fp = io.BytesIO(b"0123456789")
+        fp.seek(4)
+
+        stream = UploadStream(fp)
+
+        assert len(stream) == 6
+        assert stream.read() == b"456789"
+
+    def test_upload_stream_starts_over_when_sent_again(self):
+        fp = io.BytesIO(b"0123456789")
+        fp.seek(4)
+
+        stream = UploadStream(fp)
+
+        assert b"".join(iter(lambda: stream.read(4), b"")) == b"456789"
+        assert b"".join(iter(lambda: stream.read(4), b"")) == b"456789"
+
+    def test_zendesk_upload_attachment_resent_after_rate_limit(self):
+        sent = []
+
+        class RateLimitingAdapter(BaseAdapter):
+            def send(self, request, **kwargs):
+                sent.append(
+                    (
+                        request.headers.get("Content-Length"),
+                        b"".join(iter(lambda: request.body.read(4), b"")),
+                    )
+                )
+                response = requests.Response()
+                response.request = request
+                response.url = request.url
+                if len(sent) == 1:
+                    response.status_code = 429
+                    response.headers["Retry-After"] = "1"
+                else:
+                    response.status_code = 201
+                    response._content = b'{"upload": {"token": "token1"}}'
+                return response
+
+            def close(self):
+                pass
+
+        session = requests.Session()
+        session.mount("https://", RateLimitingAdapter())
+        zendesk_manager = ZendeskManager(
+            credentials={
+                "email": "test@example.com",  # test email /PS-IGNORE
+                "token": "token123",
+                "subdomain": "subdomain123",
+            },
+            session=session,
+        )
+
+        # An empty file has no Content-Length and is sent chunked.
+        for content, length in ((b"log line one\n", "13"), (b"", None)):
+            sent.clear()
+            attachment = HelpDeskAttachment(
+                file_name="app.log", content=io.BytesIO(content)
+            )
+            with mock.patch("zenpy.lib.api.sleep"):
+                token = zendesk_manager.upload_attachment(attachment)
+
+            assert token == "token1"
+            assert sent == [(length, content), (length, content)]
+
+    def test_zendesk_operation_timeouts(self):
+        with mock.patch.object(requests.Session, "request") as request:
+            zendesk_manager = ZendeskManager(
+                credentials={
+                    "email": "test@example.com",  # test email /PS-IGNORE
+                    "token": "token123",
+                    "subdomain": "subdomain123",
+                },
+                timeouts={"get_ticket": 2},
+                adaptive_timeouts=True,
+            )
+            session = zendesk_manager.client.users.session
+            zendesk_manager.client = FakeApi()
+            zendesk_manager.client.tickets = FlakyTickets(session=session)
+
+            zendesk_manager.get_ticket(ticket_id=12345)
+            assert request.call_args.kwargs["timeout"] == 2
+
+            for _ in range(20):
+                zendesk_manager.latencies.record("get_ticket", 0.3)
+            zendesk_manager.get_ticket(ticket_id=12345)
+            assert request.call_args.kwargs["timeout"] == 0.3 * 3
+
+    def test_zendesk_hedged_get_ticket(self):
+        zendesk_manager = ZendeskManager(
+            credentials={
+                "email": "test@example.com",  # test email /PS-IGNORE
+                "token": "token123",
+                "subdomain": "subdomain123",
+            },
+            hedge_reads=True,
+        )
+        zendesk_manager.client = FakeApi()
+        zendesk_manager.client.tickets = FlakyTickets(delays=[1])
+        for _ in range(20):
+            zendesk_manager.latencies.record("get_ticket", 0.01)
+
+        start = time.monotonic()
+        ticket = zendesk_manager.get_ticket(ticket_id=12345)
+
+        assert ticket.id == 12345
+        assert time.monotonic() - start < 0.5
+        assert zendesk_manager.client.tickets.calls == 2
+
+    def test_zendesk_circuit_breaker(self):
+        zendesk_manager = ZendeskManager(
+            credentials={
+                "email": "test@example.com",  # test email /PS-IGNORE
+                "token": "token123",
+                "subdomain": "subdomain123",
+            },
+            circuit_failure_threshold=2,
+        )
+        zendesk_manager.client = FakeApi()
+        zendesk_manager.client.tickets = FlakyTickets(failures=2)
+
+        for _ in range(2):
+            with self.assertRaises(requests.exceptions.ConnectionError):
+                zendesk_manager.get_ticket(ticket_id=12345)
+        with self.assertRaises(HelpDeskUnavailableException):
+            zendesk_manager.get_ticket(ticket_id=12345)
+
+        assert zendesk_manager.client.tickets.calls == 2
+
+    def test_zendesk_circuit_breaker_trial_not_found(self):
+        zendesk_manager = ZendeskManager(
+            credentials={
+                "email": "test@example.com",  # test email /PS-IGNORE
+                "token": "token123",
+                "subdomain": "subdomain123",
+            },
+            circuit_failure_threshold=1,
+            circuit_reset_timeout=0,
+        )
+        zendesk_manager.client = FakeApi()
+        tickets = zendesk_manager.client.tickets
+        zendesk_manager.client.tickets = FlakyTickets(failures=1)
+
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            zendesk_manager.get_ticket(ticket_id=12345)
+        zendesk_manager.client.tickets = tickets
+
+        # A missing ticket ends the trial, so the next call is let through.
+        for _ in range(2):
+            with self.assertRaises(HelpDeskTicketNotFoundException):
+                zendesk_manager.get_ticket(ticket_id=54321)
+
+    def test_zendesk_cached_reads_skip_resilience(self):
+        zendesk_manager = ZendeskManager(
+            credentials={
+                "email": "test@example.com",  # test email /PS-IGNORE
+                "token": "token123",
+                "subdomain": "subdomain123",
+            },
+            circuit_failure_threshold=1,
+            cached_reads=True,
+        )
+        zendesk_manager.client = FakeApi(tickets=[FakeTicket(ticket_id=12345)])
+        zendesk_manager.get_ticket(ticket_id=12345)
+
+        zendesk_manager.circuit_breaker.record_failure()
+        with mock.patch.object(zendesk_manager.latencies, "record") as record:
+            ticket = zendesk_manager.get_ticket(ticket_id=12345)
+
+        assert ticket.id == 12345
+        record.assert_not_called()
+        assert zendesk_manager.circuit_breaker.state == "open"
+
+    def test_zendesk_circuit_breaker_fallback(self):
+        mirror = {12345: HelpDeskTicket(id=12345, subject="from the mirror")}
+        zendesk_manager = ZendeskManager(
+            credentials={
+                "email": "test@example.com",  # test email /PS-IGNORE
+                "token": "token123",
+                "subdomain": "subdomain123",
+            },
+            circuit_failure_threshold=1,
+            fallback=lambda operation, ticket_id: mirror[ticket_id],
+        )
+        zendesk_manager.client = FakeApi()
+        zendesk_manager.client.tickets = FlakyTickets(failures=1)
+
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            zendesk_manager.get_ticket(ticket_id=12345)
+        ticket = zendesk_manager.get_ticket(12345)
+
+        assert ticket.subject == "from the mirror"
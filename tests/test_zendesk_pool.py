@@ -0,0 +1,101 @@
+import datetime
+import unittest
+from unittest import mock
+
+from help_desk_client.interfaces import HelpDeskException
+from help_desk_client.zendesk_pool import ZendeskManagerPool
+
+
+def credentials(subdomain, **kwargs):
+    return dict(
+        email="test@example.com",  # test email /PS-IGNORE
+        token="token123",
+        subdomain=subdomain,
+        **kwargs,
+    )
+
+
+class FakeResponse(object):
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.elapsed = datetime.timedelta(milliseconds=250)
+
+
+class TestZendeskManagerPool(unittest.TestCase):
+    def test_get_shares_connection_pool(self):
+        pool = ZendeskManagerPool()
+        pool.register("one", credentials("one"))
+        pool.register("two", credentials("two", ratelimit_budget=30))
+
+        one = pool.get("one")
+        two = pool.get("two")
+
+        assert one is pool.get("one")
+        assert one is not two
+        assert one.client.tickets.session is not two.client.tickets.session
+        for manager in (one, two):
+            session = manager.client.tickets.session
+            assert session.get_adapter("https://x.zendesk.com") is pool.adapter
+        assert one.client.tickets.ratelimit_budget is None
+        assert two.client.tickets.ratelimit_budget == 30
+
+    def test_keeps_a_connection_pool_per_tenant(self):
+        assert ZendeskManagerPool().adapter._pool_connections == 50
+        assert ZendeskManagerPool(max_tenants=80).adapter._pool_connections == 80
+        assert ZendeskManagerPool(pool_connections=5).adapter._pool_connections == 5
+
+    def test_register_passes_manager_kwargs(self):
+        pool = ZendeskManagerPool(safe_update=True, user_cache_size=10)
+        pool.register("one", credentials("one"), user_cache_size=20)
+
+        manager = pool.get("one")
+
+        assert manager.safe_update is True
+        assert manager.user_cache_size == 20
+
+    def test_least_recently_used_tenant_is_evicted(self):
+        pool = ZendeskManagerPool(max_tenants=2)
+        for tenant in ("one", "two", "three"):
+            pool.register(tenant, credentials(tenant))
+
+        one = pool.get("one")
+        pool.get("two")
+        pool.get("one")
+        pool.get("three")
+
+        assert pool.get("one") is one
+        pool.get("two")
+        assert pool.stats()["two"].managers_created == 2
+        assert pool.stats()["one"].managers_created == 1
+
+    def test_idle_tenant_is_evicted(self):
+        pool = ZendeskManagerPool(idle_timeout=60)
+        pool.register("one", credentials("one"))
+
+        with mock.patch("help_desk_client.zendesk_pool.time.monotonic") as monotonic:
+            monotonic.return_value = 1000
+            one = pool.get("one")
+            monotonic.return_value = 1030
+            assert pool.get("one") is one
+            monotonic.return_value = 1100
+            assert pool.get("one") is not one
+
+    def test_stats_record_api_calls(self):
+        pool = ZendeskManagerPool()
+        pool.register("one", credentials("one"))
+        session = pool.get("one").client.tickets.session
+
+        for hook in session.hooks["response"]:
+            hook(FakeResponse(200))
+            hook(FakeResponse(429))
+
+        stats = pool.stats()["one"]
+        assert stats.api_calls == 2
+        assert stats.api_errors == 1
+        assert stats.api_seconds == 0.5
+
+    def test_error_unknown_tenant(self):
+        pool = ZendeskManagerPool()
+
+        with self.assertRaises(HelpDeskException):
+            pool.get("missing")
@@ -0,0 +1,206 @@
+import datetime
+import unittest
+
+from help_desk_client.interfaces import (
+    HelpDeskCustomField,
+    HelpDeskFieldOption,
+    HelpDeskGroup,
+    HelpDeskTicket,
+    HelpDeskUser,
+    HelpDeskValidationException,
+)
+from help_desk_client.zendesk_manager import ZendeskManager
+from help_desk_client.zendesk_schema import ZendeskSchema
+from tests.test_zendesk_manager import FakeApi, FakeTicket, FakeUser
+
+
+class FakeTicketField(object):
+    def __init__(self, id, title, type, **kwargs):
+        self.id = id
+        self.title = title
+        self.type = type
+        self.__dict__.update(kwargs)
+
+
+class FakeGroup(object):
+    def __init__(self, id, name):
+        self.id = id
+        self.name = name
+
+
+TICKET_FIELDS = [
+    FakeTicketField(1, "Service", "tagger", custom_field_options=[
+        {"id": 11, "name": "Data Workspace", "value": "data_workspace"},
+        {"id": 12, "name": "Digital Workspace", "value": "digital_workspace"},
+    ]),
+    FakeTicketField(2, "Urgent", "checkbox"),
+    FakeTicketField(3, "Seats", "integer"),
+    FakeTicketField(4, "Cost", "decimal"),
+    FakeTicketField(5, "Due", "date"),
+    FakeTicketField(6, "Reference", "regexp", regexp_for_validation=r"[A-Z]{3}\d+"),
+    FakeTicketField(7, "Old field", "text", active=False),
+    FakeTicketField(8, "Notes", "text"),
+    FakeTicketField(9, "Account manager", "lookup"),
+    FakeTicketField(10, "Code", "regexp", regexp_for_validation=r"\A[A-Z]+\z"),
+]  # fmt: skip
+
+GROUPS = [FakeGroup(100, "Support"), FakeGroup(200, "Engineering")]
+
+
+class FakeSchemaApi(FakeApi):
+    def ticket_fields(self):
+        self.calls.append("ticket_fields")
+        return TICKET_FIELDS
+
+    def groups(self):
+        self.calls.append("groups")
+        return GROUPS
+
+
+class TestZendeskSchema(unittest.TestCase):
+    def setUp(self):
+        self.client = FakeSchemaApi()
+        self.schema = ZendeskSchema(lambda: self.client)
+
+    def test_schema_loads_once(self):
+        assert self.schema.find_ticket_field("service").id == 1
+        assert self.schema.find_group("support") == HelpDeskGroup(
+            id=100, name="Support"
+        )
+        assert len(self.schema.ticket_fields()) == len(TICKET_FIELDS)
+        assert self.client.calls == ["ticket_fields", "groups"]
+
+        assert self.schema.ticket_field(1).options == [
+            HelpDeskFieldOption(id=11, name="Data Workspace", value="data_workspace"),
+            HelpDeskFieldOption(
+                id=12, name="Digital Workspace", value="digital_workspace"
+            ),
+        ]
+
+    def test_schema_reloads_after_ttl(self):
+        schema = ZendeskSchema(lambda: self.client, ttl=0)
+        schema.groups()
+        schema.groups()
+        assert self.client.calls.count("groups") == 2
+
+        self.schema.groups()
+        self.schema.refresh()
+        assert self.client.calls.count("groups") == 4
+
+    def test_coerce_values(self):
+        assert self.schema.coerce(1, "Data Workspace") == "data_workspace"
+        assert self.schema.coerce(1, "digital_workspace") == "digital_workspace"
+        assert self.schema.coerce(2, "yes") is True
+        assert self.schema.coerce(2, False) is False
+        assert self.schema.coerce(3, 12) == "12"
+        assert self.schema.coerce(3, " 7 ") == "7"
+        assert self.schema.coerce(4, 1.5) == "1.5"
+        assert self.schema.coerce(5, datetime.date(2022, 5, 1)) == "2022-05-01"
+        assert self.schema.coerce(5, "2022-05-01") == "2022-05-01"
+        assert self.schema.coerce(6, "ABC123") == "ABC123"
+        assert self.schema.coerce(8, None) is None
+        assert self.schema.coerce(9, 360001) == 360001
+        # Ruby patterns Python can't compile are left for Zendesk to check.
+        assert self.schema.coerce(10, "abc") == "abc"
+
+    def test_error_coerce_invalid_values(self):
+        invalid = [
+            (1, "Not a service"),
+            (2, "maybe"),
+            (3, "1.5"),
+            (3, True),
+            (4, "lots"),
+            (5, "01/05/2022"),
+            (6, "abc123"),
+            (7, "text"),
+            (8, 123),
+            (99, "unknown field"),
+        ]
+        for field_id, value in invalid:
+            with self.subTest(field_id=field_id, value=value):
+                with self.assertRaises(HelpDeskValidationException):
+                    self.schema.coerce(field_id, value)
+
+    def test_validate_custom_fields(self):
+        custom_fields = [
+            HelpDeskCustomField(id=1, value="Data Workspace"),
+            HelpDeskCustomField(id=3, value=2),
+        ]
+        assert self.schema.validate_custom_fields(custom_fields) == [
+            HelpDeskCustomField(id=1, value="data_workspace"),
+            HelpDeskCustomField(id=3, value="2"),
+        ]
+        assert custom_fields[0].value == "Data Workspace"
+
+    def test_validate_group(self):
+        self.schema.validate_group(100)
+        self.schema.validate_group(None)
+        with self.assertRaises(HelpDeskValidationException):
+            self.schema.validate_group(300)
+
+
+class TestZendeskManagerValidation(unittest.TestCase):
+    def setUp(self):
+        self.zendesk_manager = ZendeskManager(
+            credentials={
+                "email": "test@example.com",  # test email /PS-IGNORE
+                "token": "token123",
+                "subdomain": "subdomain123",
+            },
+            validate_fields=True,
+        )
+        fake_user = FakeUser(
+            id=1234,
+            name="Jim Example",
+            email="test@example.com",  # test email /PS-IGNORE
+        )
+        self.zendesk_manager.client = FakeSchemaApi(
+            tickets=[FakeTicket(ticket_id=1)], users=[fake_user]
+        )
+
+    def test_zendesk_create_ticket_coerces_custom_fields(self):
+        ticket = HelpDeskTicket(
+            subject="subject123",
+            description="Field: value",
+            user=HelpDeskUser(id=1234),
+            group_id=100,
+            custom_fields=[HelpDeskCustomField(id=1, value="Data Workspace")],
+        )
+
+        actual = self.zendesk_manager.create_ticket(ticket=ticket)
+        assert actual.custom_fields == [
+            HelpDeskCustomField(id=1, value="data_workspace")
+        ]
+
+    def test_error_zendesk_create_ticket_invalid_custom_field(self):
+        ticket = HelpDeskTicket(
+            subject="subject123",
+            description="Field: value",
+            user=HelpDeskUser(id=1234),
+            custom_fields=[HelpDeskCustomField(id=3, value="several")],
+        )
+
+        with self.assertRaises(HelpDeskValidationException):
+            self.zendesk_manager.create_ticket(ticket=ticket)
+        assert list(self.zendesk_manager.client._tickets) == [1]
+
+    def test_error_zendesk_update_ticket_unknown_group(self):
+        ticket = self.zendesk_manager.get_ticket(ticket_id=1)
+        ticket.group_id = 300
+
+        with self.assertRaises(HelpDeskValidationException):
+            self.zendesk_manager.update_ticket(ticket)
+        assert self.zendesk_manager.client.updates == []
+
+    def test_zendesk_update_ticket_checks_only_changed_fields(self):
+        self.zendesk_manager.client._tickets[1].custom_fields = [
+            {"id": 7, "value": "set before the field was deactivated"},
+            {"id": 2, "value": False},
+        ]
+        ticket = self.zendesk_manager.get_ticket(ticket_id=1)
+        ticket.custom_fields[1] = HelpDeskCustomField(id=2, value="yes")
+
+        self.zendesk_manager.update_ticket(ticket)
+
+        sent = self.zendesk_manager.client.updates[0].to_dict(serialize=True)
+        assert sent["custom_fields"] == [{"id": 2, "value": True}]
@@ -0,0 +1,165 @@
+import base64
+import datetime
+import hashlib
+import hmac
+import json
+import unittest
+
+from help_desk_client.interfaces import (
+    HelpDeskStubbed,
+    HelpDeskTicket,
+    HelpDeskTicketDelta,
+    HelpDeskUser,
+    HelpDeskUserDelta,
+)
+from help_desk_client.zendesk_manager import ZendeskManager
+from help_desk_client.zendesk_webhooks import (
+    ZendeskWebhookHandler,
+    ZendeskWebhookSignatureException,
+)
+from tests.test_zendesk_manager import FakeApi, FakeTicket, FakeUser
+
+
+SECRET = "dGhpc19zZWNyZXRfaXNfZm9yX3Rlc3Rpbmdfb25seQ=="  # /PS-IGNORE
+
+
+def signed_headers(body, secret=SECRET, timestamp=None):
+    timestamp = timestamp or datetime.datetime.now(datetime.timezone.utc).strftime(
+        "%Y-%m-%dT%H:%M:%SZ"
+    )
+    signature = base64.b64encode(
+        hmac.new(secret.encode(), timestamp.encode() + body, hashlib.sha256).digest()
+    ).decode()
+    return {
+        "X-Zendesk-Webhook-Signature": signature,
+        "X-Zendesk-Webhook-Signature-Timestamp": timestamp,
+    }
+
+
+def ticket_event(change, ticket_id=12345, **detail):
+    return json.dumps(
+        {
+            "type": f"zen:event-type:ticket.{change}",
+            "detail": dict(id=str(ticket_id), **detail),
+        }
+    ).encode()
+
+
+class TestZendeskWebhookHandler(unittest.TestCase):
+    def setUp(self):
+        self.zendesk_manager = ZendeskManager(
+            credentials={
+                "email": "test@example.com",  # test email /PS-IGNORE
+                "token": "token123",
+                "subdomain": "subdomain123",
+            },
+            cached_reads=True,
+        )
+        fake_user = FakeUser(
+            id=1234,
+            name="Jim Example",
+            email="test@example.com",  # test email /PS-IGNORE
+        )
+        fake_ticket = FakeTicket(ticket_id=12345)
+        fake_ticket.updated_at = "2022-08-01T10:00:00Z"
+        self.zendesk_manager.client = FakeApi(tickets=[fake_ticket], users=[fake_user])
+        self.zendesk_manager.get_ticket(ticket_id=12345)
+        self.zendesk_manager.get_or_create_user(HelpDeskUser(id=1234))
+        self.zendesk_manager.client.calls.clear()
+        self.handler = ZendeskWebhookHandler(SECRET, help_desk=self.zendesk_manager)
+
+    def test_handle_ticket_event_updates_cached_ticket(self):
+        body = ticket_event(
+            "status_changed",
+            status="PENDING",
+            tags=["vip"],
+            updated_at="2022-08-01T11:00:00Z",
+        )
+
+        deltas = self.handler.handle(signed_headers(body), body)
+
+        assert deltas == [
+            HelpDeskTicketDelta(
+                ticket_id=12345,
+                changes={
+                    "status": "pending",
+                    "tags": ["vip"],
+                    "updated_at": "2022-08-01T11:00:00Z",
+                },
+                updated_at="2022-08-01T11:00:00Z",
+            )
+        ]
+        ticket = self.zendesk_manager.get_ticket(ticket_id=12345)
+        assert ticket.status == "pending"
+        assert ticket.tags == ["vip"]
+        assert ticket.subject == "fakesubject"
+        assert self.zendesk_manager.client.calls == []
+
+    def test_handle_ignores_stale_ticket_event(self):
+        body = ticket_event(
+            "status_changed", status="SOLVED", updated_at="2022-08-01T09:00:00Z"
+        )
+
+        self.handler.handle(signed_headers(body), body)
+
+        assert self.zendesk_manager.get_ticket(ticket_id=12345).status == "open"
+
+    def test_handle_deleted_ticket_is_forgotten(self):
+        self.zendesk_manager.client._tickets[12345].subject = "read from Zendesk"
+        assert self.zendesk_manager.get_ticket(ticket_id=12345).subject == (
+            "fakesubject"
+        )
+        body = ticket_event("soft_deleted")
+
+        self.handler.handle(signed_headers(body), body)
+
+        assert self.zendesk_manager.get_ticket(ticket_id=12345).subject == (
+            "read from Zendesk"
+        )
+
+    def test_handle_trigger_user_webhook(self):
+        body = json.dumps({"user": {"id": 1234, "name": "Jim Renamed"}}).encode()
+
+        deltas = self.handler.handle(signed_headers(body), body)
+
+        assert deltas == [
+            HelpDeskUserDelta(user_id=1234, changes={"full_name": "Jim Renamed"})
+        ]
+        user = self.zendesk_manager.get_or_create_user(HelpDeskUser(id=1234))
+        assert user.full_name == "Jim Renamed"
+
+    def test_parse_ignores_unknown_events(self):
+        body = json.dumps(
+            {"type": "zen:event-type:organization.created", "detail": {"id": "1"}}
+        )
+
+        assert self.handler.parse(body) == []
+        assert self.handler.parse("{}") == []
+
+    def test_error_bad_signature(self):
+        body = ticket_event("status_changed", status="PENDING")
+
+        with self.assertRaises(ZendeskWebhookSignatureException):
+            self.handler.handle(signed_headers(body, secret="wrong"), body)
+        with self.assertRaises(ZendeskWebhookSignatureException):
+            self.handler.handle({}, body)
+
+        assert self.zendesk_manager.get_ticket(ticket_id=12345).status == "open"
+
+    def test_error_old_signature(self):
+        body = ticket_event("status_changed", status="PENDING")
+
+        with self.assertRaises(ZendeskWebhookSignatureException):
+            self.handler.handle(
+                signed_headers(body, timestamp="2022-08-01T10:00:00Z"), body
+            )
+
+    def test_handle_applies_to_stubbed_help_desk(self):
+        help_desk = HelpDeskStubbed()
+        ticket = help_desk.create_ticket(HelpDeskTicket(subject="subject123"))
+        handler = ZendeskWebhookHandler(SECRET, help_desk=help_desk)
+        body = ticket_event("subject_changed", ticket_id=ticket.id, subject="new")
+
+        handler.handle(signed_headers(body), body)
+
+        assert help_desk.get_ticket(ticket.id).subject == "new"